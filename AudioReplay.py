@@ -0,0 +1,255 @@
+"""
+Replay recorded audio through the voice path against a fake Speech to Text server
+
+WAV files are fed chunk by chunk through pyaudio_callback into the same queue and AudioSource
+the client records into, recognized by the SDK against a local FakeSpeechToText and dispatched
+by MyRecognizeCallback. Reports audio throughput, queue behavior and latency from enqueueing
+audio to dispatching its command, and checks that no audio was dropped and every scripted final
+result was dispatched.
+
+A WAV file (16-bit mono) can have a script next to it with the same name and a .json
+extension, a list of {"at": seconds, "transcript": str, "final": bool}. Without one, an interim
+result halfway through and a final result at the end are sent, both transcribed as the file name.
+
+    python AudioReplay.py recordings/*.wav --speed 2
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import wave
+
+from queue import Empty
+from threading import Event, Thread
+
+from ibm_cloud_sdk_core.authenticators import NoAuthAuthenticator
+from ibm_watson import SpeechToTextV1
+
+import Voice
+from Metrics import percentile
+from StubServers import FakeSpeechToText
+
+def read_wav(path):
+    """
+    Read a 16-bit mono WAV file into chunks the size PyAudio delivers
+
+    Parameters:
+        path (str): WAV file to read
+
+    Returns:
+        chunks (list[bytes]): audio chunks of Voice.CHUNK frames
+        rate (int): sample rate of the recording
+    """
+    with wave.open(path, 'rb') as wav:
+        if wav.getsampwidth() != 2 or wav.getnchannels() != Voice.CHANNELS:
+            raise ValueError(f'{path}: expected 16-bit mono audio')
+        rate = wav.getframerate()
+        chunks = []
+        data = wav.readframes(Voice.CHUNK)
+        while data:
+            chunks.append(data)
+            data = wav.readframes(Voice.CHUNK)
+    return chunks, rate
+
+def load_script(path, duration):
+    script_path = os.path.splitext(path)[0] + '.json'
+    if os.path.exists(script_path):
+        with open(script_path) as f:
+            return json.load(f)
+
+    transcript = os.path.splitext(os.path.basename(path))[0].replace('_', ' ').replace('-', ' ')
+    return [
+        {'at': duration / 2, 'transcript': transcript, 'final': False},
+        {'at': duration, 'transcript': transcript, 'final': True},
+    ]
+
+class ReplayCallback(Voice.MyRecognizeCallback):
+    def __init__(self, on_command):
+        super().__init__(on_command)
+        self.listening = Event()
+        self.errors = []
+
+    def on_listening(self):
+        super().on_listening()
+        self.listening.set()
+
+    def on_error(self, error):
+        super().on_error(error)
+        self.errors.append(str(error))
+        self.listening.set()
+
+def latency_summary(values):
+    ordered = sorted(values)
+    return {
+        'p50': 1000 * percentile(ordered, 50),
+        'p99': 1000 * percentile(ordered, 99),
+        'max': 1000 * (ordered[-1] if ordered else 0),
+    }
+
+class Replay:
+    def __init__(self, fake, speed, timeout):
+        self.fake = fake
+        self.speed = speed
+        self.timeout = timeout
+        self.speech_to_text = SpeechToTextV1(authenticator=NoAuthAuthenticator())
+        self.speech_to_text.set_service_url(fake.url)
+        self.dispatched = []
+
+    def on_command(self, transcript):
+        self.dispatched.append((time.perf_counter(), transcript))
+
+    def feed(self, chunks, rate):
+        """
+        Push chunks through pyaudio_callback at the replay speed, as the PyAudio stream would
+
+        At speed 0 every chunk waits for room in the queue instead, so audio is fed as fast as
+        the recognizer consumes it without dropping any.
+        """
+        period = Voice.CHUNK / rate
+        interval = period / self.speed if self.speed > 0 else 0
+        enqueued, blocked, depths = [], [], []
+
+        start = time.perf_counter()
+        for i, chunk in enumerate(chunks):
+            scheduled = start + i * interval
+            now = time.perf_counter()
+            if scheduled > now:
+                time.sleep(scheduled - now)
+            while self.speed <= 0 and Voice.q.full():
+                time.sleep(0.001)
+
+            if i == len(chunks) - 1:
+                # mark the end first so the SDK stops once the queue drains
+                Voice.audio_source.completed_recording()
+            began = time.perf_counter()
+            Voice.pyaudio_callback(chunk, len(chunk) // 2, None, 0)
+            ended = time.perf_counter()
+
+            enqueued.append(began)
+            blocked.append(ended - began)
+            depths.append(Voice.q.qsize())
+
+        return enqueued, blocked, depths
+
+    def run(self, path):
+        chunks, rate = read_wav(path)
+        duration = sum(len(chunk) for chunk in chunks) / (2 * rate)
+        script = load_script(path, duration)
+
+        # reset the shared audio source between recordings
+        while True:
+            try:
+                Voice.q.get_nowait()
+            except Empty:
+                break
+        Voice.audio_source.is_recording = True
+        Voice.audio_clock.reset(rate)
+        self.fake.script = script
+        self.dispatched = []
+
+        callback = ReplayCallback(self.on_command)
+        th = Thread(
+            target=Voice.recognize_using_websocket,
+            args=(self.speech_to_text, callback),
+            kwargs={'rate': rate},
+            daemon=True,
+        )
+        th.start()
+        callback.listening.wait(self.timeout)
+
+        drops = Voice.AUDIO_DROPS.value
+        start = time.perf_counter()
+        enqueued, blocked, depths = self.feed(chunks, rate)
+        fed = time.perf_counter() - start
+        th.join(self.timeout)
+        session = self.fake.sessions[-1] if self.fake.sessions else None
+
+        finals = [result for result in script if result.get('final')]
+        expected = [result['transcript'].lower() for result in finals]
+        received = [transcript for _, transcript in self.dispatched]
+
+        # latency from enqueueing the chunk that completes a final result to dispatching it
+        dispatch_latency = []
+        for result, (dispatched_at, _) in zip(finals, self.dispatched):
+            index = min(max(math.ceil(result['at'] * rate / Voice.CHUNK) - 1, 0), len(enqueued) - 1)
+            dispatch_latency.append(dispatched_at - enqueued[index])
+
+        # latency from the fake server sending a final result to dispatching it
+        sent = [result['sent'] for result in session.sent if result['final']] if session else []
+        result_latency = [dispatched_at - sent_at for sent_at, (dispatched_at, _) in zip(sent, self.dispatched)]
+
+        period = Voice.CHUNK / rate / self.speed if self.speed > 0 else math.inf
+        chunks_received = session.chunks_received if session else 0
+        chunks_dropped = Voice.AUDIO_DROPS.value - drops
+        return {
+            'file': path,
+            'audio_seconds': duration,
+            'feed_seconds': fed,
+            'speed': duration / fed if fed else 0,
+            'chunks': len(chunks),
+            'chunks_received': chunks_received,
+            'chunks_dropped': chunks_dropped,
+            'queue_depth': {
+                'mean': sum(depths) / len(depths) if depths else 0,
+                'max': max(depths) if depths else 0,
+                'capacity': Voice.q.maxsize,
+            },
+            'callback_ms': latency_summary(blocked),
+            'callback_overruns': sum(1 for b in blocked if b > period),
+            'dispatch_latency_ms': latency_summary(dispatch_latency),
+            'result_latency_ms': latency_summary(result_latency),
+            'expected': expected,
+            'dispatched': received,
+            'errors': callback.errors,
+            # the fake server sends every scripted result at the end, dropped audio has to fail on its own
+            'passed': (expected == received and not callback.errors and not chunks_dropped
+                       and chunks_received == len(chunks)),
+        }
+
+def print_report(report):
+    status = 'ok' if report['passed'] else 'FAILED'
+    depth = report['queue_depth']
+    callback = report['callback_ms']
+    dispatch = report['dispatch_latency_ms']
+    result = report['result_latency_ms']
+    print(f"{report['file']}: {status}")
+    print(f"  {report['audio_seconds']:.2f}s audio fed in {report['feed_seconds']:.2f}s ({report['speed']:.2f}x), "
+          f"{report['chunks_received']}/{report['chunks']} chunks received, {report['chunks_dropped']} dropped")
+    print(f"  queue depth: mean {depth['mean']:.1f}, max {depth['max']} of {depth['capacity']}")
+    print(f"  pyaudio_callback ms: p50 {callback['p50']:.2f}, p99 {callback['p99']:.2f}, max {callback['max']:.2f}, "
+          f"{report['callback_overruns']} overruns")
+    print(f"  enqueue to dispatch ms: p50 {dispatch['p50']:.1f}, p99 {dispatch['p99']:.1f}, max {dispatch['max']:.1f}")
+    print(f"  result to dispatch ms: p50 {result['p50']:.1f}, p99 {result['p99']:.1f}, max {result['max']:.1f}")
+    if not report['passed']:
+        print(f"  expected {report['expected']}")
+        print(f"  dispatched {report['dispatched']}")
+        for error in report['errors']:
+            print(f'  error: {error}')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay WAV files through the voice path offline')
+    parser.add_argument('wavs', nargs='+', help='16-bit mono WAV files')
+    parser.add_argument('--speed', type=float, default=1,
+                        help='replay speed, 0 feeds as fast as the recognizer takes audio from the queue')
+    parser.add_argument('--delay', type=float, default=0, help='seconds of recognition delay of the fake server')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds to wait for the recognizer')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args(argv)
+
+    with FakeSpeechToText(delay=args.delay) as fake:
+        replay = Replay(fake, args.speed, args.timeout)
+        reports = [replay.run(path) for path in args.wavs]
+
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        for report in reports:
+            print_report(report)
+
+    return 0 if all(report['passed'] for report in reports) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,15 +7,16 @@ import tkinter.font
 import urllib.request
 import uuid
 
-from queue import Queue, Full
 from threading import Thread
 
 import pyaudio
 from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
 from ibm_watson import SpeechToTextV1
-from ibm_watson.websocket import RecognizeCallback, AudioSource
 
-from EyeTracker import EyeTracker
+import ClientNet
+import Metrics
+import Voice
+from EyeTracker import EyeTracker, UPLOAD_BACKLOG
 
 def resource_path(relative_path):
     """Get absolute path to a resource, works for dev and for PyInstaller executables"""
@@ -27,17 +28,6 @@ def resource_path(relative_path):
     
     return os.path.join(base_path, relative_path)
 
-# PyAudio Configuration
-CHUNK = 1024
-BUF_MAX_SIZE = CHUNK * 10
-q = Queue(maxsize=int(round(BUF_MAX_SIZE / CHUNK)))
-FORMAT = pyaudio.paInt16
-CHANNELS = 1
-RATE = 44100
-
-# Create an instance of AudioSource
-audio_source = AudioSource(q, True, True)
-
 # File with environment variables
 with open(resource_path("ENV")) as f:
     ENV = json.load(f)
@@ -45,8 +35,23 @@ with open(resource_path("ENV")) as f:
 # MultiCraftTextServer Endpoint
 MCTS_URL = ENV.get("MCTS_URL", "")
 
+# Optional runtime metrics, served on localhost and logged periodically
+if ENV.get("METRICS_PORT"):
+    try:
+        Metrics.serve(int(ENV["METRICS_PORT"]))
+    except OSError as e:
+        # metrics are optional, e.g. another client on this machine may already use the port
+        print(f'Unable to serve metrics on port {ENV["METRICS_PORT"]}: {e}')
+if ENV.get("METRICS_LOG_INTERVAL"):
+    Metrics.log_periodically(float(ENV["METRICS_LOG_INTERVAL"]))
+
 # EyeTracker Setup
-EYE_TRACKER = EyeTracker()
+# GAZE_EVENTS ("ivt" or "idt") uploads fixations and saccades instead of raw samples, with
+# GAZE_EVENT_OPTIONS overriding the detector thresholds, e.g. {"dispersion": 40}
+# GAZE_SOURCE ("tobii", "webcam" or "synthetic") overrides the detected gaze source
+# GAZE_ALWAYS_ON keeps the webcam recording for the whole session, not only during track commands
+EYE_TRACKER = EyeTracker(ENV.get("GAZE_EVENTS"), ENV.get("GAZE_KEEP_RAW", True), ENV.get("GAZE_SOURCE"),
+                         ENV.get("GAZE_ALWAYS_ON", False), ENV.get("GAZE_EVENT_OPTIONS"))
 
 SERVER = ''
 
@@ -80,6 +85,12 @@ def connect_to_server(server_ip):
     except (socket.timeout, socket.gaierror, TimeoutError, ConnectionRefusedError):
         return f'Unable to connect: IP may be incorrect'
 
+def send_command(transcript):
+    try:
+        ClientNet.send_command(MCTS_URL, CLIENT_NAME, transcript, SERVER)
+    except (urllib.error.HTTPError, socket.timeout):
+        pass
+
 def connect_to_voice():
     global SPEECH_TO_TEXT, CUSTOMIZATION_ID
     API_KEY = ENV.get("API_KEY", "")
@@ -89,65 +100,15 @@ def connect_to_voice():
     SPEECH_TO_TEXT = SpeechToTextV1(authenticator=authenticator)
     SPEECH_TO_TEXT.set_service_url(SERVICE_URL)
 
-# Define callback for the Speech to Text service
-class MyRecognizeCallback(RecognizeCallback):
-    def __init__(self):
-        RecognizeCallback.__init__(self)
-
-    def on_transcription(self, transcript):
-        print(transcript)
-
-    def on_connected(self):
-        print('Connection was successful')
-
-    def on_error(self, error):
-        print(f'Error received: {error}')
-
-    def on_inactivity_timeout(self, error):
-        print(f'Inactivity timeout: {error}')
-
-    def on_listening(self):
-        print('Service is listening\nEnter CTRL+C to end recording...')
-
-    def on_hypothesis(self, hypothesis):
-        pass
-
-    def on_data(self, data):
-        # Once received a command, print and send the command string to the server
-        if(data['results'][0]['final']):
-            transcript = data['results'][0]['alternatives'][0]['transcript'].lower()
-            voice_frame.voice_command(transcript)
-            EYE_TRACKER.process_transcript(transcript)
-            try:
-                urllib.request.urlopen(
-                    f"{MCTS_URL}?uuid={CLIENT_NAME}&transcript={transcript.strip().replace(' ', '+')}&server={SERVER}",
-                    timeout=5
-                )
-            except (urllib.error.HTTPError, socket.timeout):
-                pass
-
-    def on_close(self):
-        CLIENT_SOCKET.close()
-        print('Connection closed')
+def voice_command(transcript):
+    voice_frame.voice_command(transcript)
+    EYE_TRACKER.process_transcript(transcript)
+    send_command(transcript)
 
 # Initiate the recognize service and pass in the AudioSource
 def recognize_using_websocket(*args):
-    mycallback = MyRecognizeCallback()
-
-    SPEECH_TO_TEXT.recognize_using_websocket(audio=audio_source,
-                                             content_type='audio/l16; rate=44100',
-                                             recognize_callback=mycallback,
-                                             language_customization_id=CUSTOMIZATION_ID,
-                                             customization_weight=0.9,
-                                             interim_results=True)
-
-# Define callback for PyAudio to store the recording in queue
-def pyaudio_callback(in_data, frame_count, time_info, status):
-    try:
-        q.put(in_data)
-    except Full:
-        pass # discard
-    return (None, pyaudio.paContinue)
+    mycallback = Voice.MyRecognizeCallback(voice_command, lambda: CLIENT_SOCKET.close())
+    Voice.recognize_using_websocket(SPEECH_TO_TEXT, mycallback, CUSTOMIZATION_ID)
 
 
 
@@ -259,13 +220,7 @@ class TextFrame(Frame):
     def send_command(self):
         message = self.entry.get().lower()
         EYE_TRACKER.process_transcript(message)
-        try:
-            urllib.request.urlopen(
-                f"{MCTS_URL}?uuid={CLIENT_NAME}&transcript={message.strip().replace(' ', '+')}&server={SERVER}",
-                timeout=5
-            )
-        except (urllib.error.HTTPError, socket.timeout):
-            pass
+        send_command(message)
 
         self.counter += 1
         self.msg_label.config(text=f'[{self.counter}] Command sent')
@@ -280,14 +235,15 @@ class VoiceFrame(Frame):
         connect_to_voice()
         self.audio = pyaudio.PyAudio()
         self.stream = self.audio.open(
-            format=FORMAT,
-            channels=CHANNELS,
-            rate=RATE,
+            format=Voice.FORMAT,
+            channels=Voice.CHANNELS,
+            rate=Voice.RATE,
             input=True,
-            frames_per_buffer=CHUNK,
-            stream_callback=pyaudio_callback,
+            frames_per_buffer=Voice.CHUNK,
+            stream_callback=Voice.pyaudio_callback,
             start=False
         )
+        Voice.audio_clock.reset(Voice.RATE)
         self.stream.start_stream()
 
         self.recognize_thread = Thread(target=recognize_using_websocket, args=())
@@ -311,7 +267,7 @@ class VoiceFrame(Frame):
         self.stream.stop_stream()
         self.stream.close()
         self.audio.terminate()
-        audio_source.completed_recording()
+        Voice.audio_source.completed_recording()
 
 
 root = tk.Tk()
@@ -338,16 +294,8 @@ def send_gaze_data():
     if not os.path.exists(EYE_TRACKER.csv) or not SERVER: return
 
     try:
-        with open(EYE_TRACKER.csv, "rb") as f:
-            data = f.read(1024)
-            if not data: return
-
-            file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            file_socket.connect((SERVER, 5004))
-            while(data):
-                file_socket.send(data)
-                data = f.read(1024)
-            file_socket.close()
+        ClientNet.send_gaze_data(EYE_TRACKER.csv, SERVER)
+        UPLOAD_BACKLOG.set(0)
     except (socket.timeout, TimeoutError):
         pass
 
@@ -0,0 +1,67 @@
+import socket
+import time
+import urllib.request
+
+import Metrics
+
+GAZE_PORT = 5004
+
+MCTS_LATENCY = Metrics.histogram('mcts_request_seconds', 'Latency of commands sent to the MultiCraftTextServer')
+MCTS_ERRORS = Metrics.counter('mcts_errors_total', 'Commands the MultiCraftTextServer failed to receive')
+GAZE_UPLOADED = Metrics.counter('gaze_uploaded_bytes_total', 'Bytes of gaze recordings uploaded')
+
+def send_command(mcts_url, client_name, transcript, server, timeout=5):
+    """
+    Send a command string to the MultiCraftTextServer
+
+    Parameters:
+        mcts_url (str): MultiCraftTextServer endpoint
+        client_name (str): uuid of the connected Minecraft player
+        transcript (str): command to send
+        server (str): Minecraft server the player is connected to
+        timeout (float, optional): request timeout in seconds. defaults to 5
+
+    Returns:
+        None
+    """
+    started = time.perf_counter()
+    try:
+        urllib.request.urlopen(
+            f"{mcts_url}?uuid={client_name}&transcript={transcript.strip().replace(' ', '+')}&server={server}",
+            timeout=timeout
+        )
+    except Exception:
+        MCTS_ERRORS.inc()
+        raise
+    finally:
+        MCTS_LATENCY.observe(time.perf_counter() - started)
+
+def send_gaze_data(csv, server, port=GAZE_PORT):
+    """
+    Upload a gaze recording to the gaze receiver of the server
+
+    Parameters:
+        csv (str): path of the gaze recording
+        server (str): address of the server
+        port (int, optional): port of the gaze receiver. defaults to 5004
+
+    Returns:
+        sent (int): number of bytes uploaded
+    """
+    sent = 0
+    with open(csv, "rb") as f:
+        data = f.read(1024)
+        if not data: return sent
+
+        file_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        try:
+            file_socket.connect((server, port))
+            while(data):
+                file_socket.sendall(data)
+                sent += len(data)
+                GAZE_UPLOADED.inc(len(data))
+                data = f.read(1024)
+        finally:
+            file_socket.close()
+
+    return sent
@@ -1,33 +1,112 @@
 import os
+import subprocess
+import time
+
+from threading import Thread
+
+import Metrics
+from GazeEvents import DETECTORS, GazeRecorder
+from GazeSource import SyntheticSource, TobiiSource, WebcamSource, iter_samples
 
 EXEC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Tobii', 'Interaction_Streams_101.exe')
 USE_TOBII = os.name == 'nt' and os.path.exists(EXEC_PATH)
 CMD_WORDS = ['build', 'place', 'move', 'track', 'turn', 'tilt', 'undo', 'redo', 'store', 'clone', 'give']
+RECORD_INTERVAL = 0.05
+SOURCES = ['tobii', 'webcam', 'synthetic']
 
-if USE_TOBII:
-    import signal
-    import subprocess
-else:
-    from Webcam import GazerBeam
+UPLOAD_BACKLOG = Metrics.gauge('gaze_upload_backlog_bytes', 'Bytes of gaze recording waiting to be uploaded')
+GAZE_DROPPED = Metrics.gauge('gaze_samples_dropped', 'Gaze samples overwritten before they were recorded')
 
 class EyeTracker:
-    def __init__(self):
+    def __init__(self, events=None, keep_raw=True, source=None, always_on=False, event_options=None):
+        """
+        Parameters:
+            events (str, optional): summarize samples into fixation and saccade records with
+                the 'ivt' or 'idt' detector instead of recording them raw. not supported with
+                the webcam, whose eye directions have no velocity or dispersion. defaults to none
+            keep_raw (boolean, optional): when summarizing, also keep the raw samples in a
+                separate .raw.csv file. defaults to true
+            source (str, optional): gaze source, 'tobii', 'webcam' or 'synthetic'. defaults to
+                tobii when its executable is available and webcam otherwise
+            always_on (boolean, optional): run the webcam for the whole session instead of
+                only during track commands. defaults to false
+            event_options (dict, optional): detector thresholds in the source's gaze units, e.g.
+                {"dispersion": 40, "min_duration": 0.08}. defaults to the detector's defaults
+        """
         import random
 
-        self.eye_tracking_process = None
+        self.source_name = source or ('tobii' if USE_TOBII else 'webcam')
+        if self.source_name not in SOURCES:
+            raise ValueError(f'Unknown gaze source {self.source_name!r}, expected one of {", ".join(SOURCES)}')
+        if self.source_name == 'tobii' and not USE_TOBII:
+            raise ValueError(f'The tobii gaze source needs Windows and {EXEC_PATH}')
+        if events and events not in DETECTORS:
+            raise ValueError(f'Unknown gaze events {events!r}, expected one of {", ".join(sorted(DETECTORS))}')
+        if events and self.source_name == 'webcam':
+            print('Gaze events are not supported with the webcam gaze source, recording raw samples')
+            events = None
+        self.source = None
+        self.always_on = always_on
         self.csv = f'gaze{random.randint(1, 999999):06d}.csv'
         self.csv_handle = None
+        self.events = events
+        self.event_options = event_options or {}
+        self.raw_csv = f'{os.path.splitext(self.csv)[0]}.raw.csv' if events and keep_raw else None
+        self.raw_handle = None
+        self.recorder = None
+        self.recording = False
+        self.recording_thread = None
+
+    def create_source(self):
+        if self.source_name == 'tobii':
+            return TobiiSource(EXEC_PATH)
+        elif self.source_name == 'synthetic':
+            return SyntheticSource()
+        else:
+            return WebcamSource()
 
     def start_eye_tracking(self):
         self.csv_handle = open(self.csv, 'w')
+        if self.raw_csv:
+            self.raw_handle = open(self.raw_csv, 'w')
+        detector = DETECTORS[self.events](**self.event_options) if self.events else None
+        self.source = self.create_source()
+        passthrough = self.source_name == 'tobii' and detector is None
+        if self.source_name == 'tobii':
+            # Interaction_Streams_101 lines are kept as printed, in the raw file when summarizing
+            if passthrough:
+                self.source.on_line = self.record_line
+            elif self.raw_handle:
+                self.source.on_line = self.raw_handle.write
+            self.recorder = GazeRecorder(self.csv_handle, detector)
+        else:
+            self.recorder = GazeRecorder(self.csv_handle, detector, self.raw_handle)
+
+        reader = self.source.ring.reader()
+        if self.source_name != 'webcam' or self.always_on:
+            self.source.start()
 
-        if USE_TOBII:
-            l_command = [EXEC_PATH, '-l']
-            self.eye_tracking_process = subprocess.Popen(
-                l_command,
-                stdin=subprocess.PIPE,
-                stdout=self.csv_handle,
-            )
+        if not passthrough:
+            # the recorder is one of the ring's consumers, it catches up every RECORD_INTERVAL
+            self.recording = True
+            self.recording_thread = Thread(target=self.record, args=(reader,), name='recorder', daemon=True)
+            self.recording_thread.start()
+
+    def record_line(self, line):
+        # called from the Tobii source's thread for every line it reads
+        self.recorder.write(line)
+        UPLOAD_BACKLOG.set(self.recorder.written)
+
+    def record(self, reader):
+        while self.recording:
+            for t, x, y in iter_samples(reader.read()):
+                self.recorder.write_sample(t, x, y)
+            UPLOAD_BACKLOG.set(self.recorder.written)
+            GAZE_DROPPED.set(reader.dropped)
+            time.sleep(RECORD_INTERVAL)
+
+        for t, x, y in iter_samples(reader.read()):
+            self.recorder.write_sample(t, x, y)
 
     def process_transcript(self, transcript):
         tokens = transcript.split()
@@ -35,7 +114,7 @@ class EyeTracker:
         if not command_words or command_words[0] != 'track':
             return
 
-        if USE_TOBII:
+        if self.source_name == 'tobii':
             t_command = [EXEC_PATH]
             if 'move' in command_words:
                 t_command += ['-m']
@@ -43,20 +122,43 @@ class EyeTracker:
                 t_command += ['-d']
 
             _ = subprocess.check_output(t_command)
+        elif not self.source.directions:
+            # GazerBeam steers by eye directions, screen coordinates would move the player wildly
+            print(f'Track commands are not supported with the {self.source_name} gaze source')
         else:
+            from Webcam import GazerBeam
+
             command = []
             if 'move' in command_words:
                 command = ['move']
             elif 'build' in command_words or 'place' in command_words:
                 command = ['stop']
 
-            GazerBeam(command, self.csv_handle).run()
+            # like the baseline, the webcam only runs during track commands unless always on
+            started = not self.source.running
+            if started:
+                self.source.start()
+            try:
+                GazerBeam(command, self.source.ring).run()
+            finally:
+                if started:
+                    self.source.stop()
 
     def terminate_eye_tracking(self):
-        if self.eye_tracking_process:
-            self.eye_tracking_process.send_signal(signal.CTRL_C_EVENT)
+        if self.source:
+            self.source.stop()
+
+        self.recording = False
+        if self.recording_thread:
+            self.recording_thread.join()
 
+        self.recorder.close()
         self.csv_handle.close()
+        if self.raw_handle:
+            self.raw_handle.close()
 
         self.csv_handle = None
-        self.eye_tracking_process = None
+        self.raw_handle = None
+        self.recorder = None
+        self.source = None
+        self.recording_thread = None
@@ -0,0 +1,448 @@
+"""
+Online fixation and saccade detection for gaze recordings
+
+Detectors take timestamped gaze samples one at a time and return compact event records as soon
+as an event is complete, so a recording can be summarized while it is written instead of
+shipping every sample. Run as a script to benchmark output size and CPU cost over recordings:
+
+    python GazeEvents.py gaze*.csv --detector idt --format tobii
+"""
+import argparse
+import math
+import os
+import re
+import time
+
+from collections import deque, namedtuple
+
+import Metrics
+
+Fixation = namedtuple('Fixation', ['start', 'duration', 'x', 'y', 'samples'])
+Saccade = namedtuple('Saccade', ['start', 'duration', 'x0', 'y0', 'x1', 'y1', 'samples'])
+
+NUMBER = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+NO_EVENTS = ()
+# Interaction_Streams_101 prints the time of day on a 12-hour clock
+HALF_DAY = 12 * 3600
+
+GAZE_SAMPLES = Metrics.counter('gaze_samples_written_total', 'Gaze samples recorded')
+GAZE_EVENTS = Metrics.counter('gaze_events_written_total', 'Fixation and saccade records written')
+
+def parse_sample(line):
+    """
+    Parse a gaze sample from a line of a recording
+
+    Parameters:
+        line (str): line with a timestamp followed by x and y, e.g. "12.5, 310, 422"
+
+    Returns:
+        sample (tuple[float] | None): (t, x, y), or None if the line is not a sample
+    """
+    numbers = NUMBER.findall(line)
+    if len(numbers) < 3:
+        return None
+    return float(numbers[0]), float(numbers[1]), float(numbers[2])
+
+def parse_tobii_sample(line):
+    """
+    Parse a gaze sample from a line printed by the Tobii Interaction_Streams_101 executable
+
+    Parameters:
+        line (str): clock time, x and y, e.g. "03:14:07.250,812.5,433.1,dwelling..."
+
+    Returns:
+        sample (tuple[float] | None): (t, x, y) with t in seconds since the 12-hour clock last
+            wrapped around, or None if the line is not a sample
+    """
+    fields = line.split(',')
+    if len(fields) < 3:
+        return None
+    try:
+        hours, minutes, seconds = fields[0].split(':')
+        t = (int(hours) % 12) * 3600 + int(minutes) * 60 + float(seconds)
+        return t, float(fields[1]), float(fields[2])
+    except ValueError:
+        return None
+
+class TobiiParser:
+    """
+    Parser of Interaction_Streams_101 lines whose timestamps keep counting up when the 12-hour
+    clock wraps around during a recording, see parse_tobii_sample
+    """
+    def __init__(self):
+        self.offset = 0
+        self.last = None
+
+    def __call__(self, line):
+        sample = parse_tobii_sample(line)
+        if sample is None:
+            return None
+        t, x, y = sample
+        if self.last is not None and t + self.offset < self.last - HALF_DAY / 2:
+            self.offset += HALF_DAY
+        self.last = t + self.offset
+        return self.last, x, y
+
+def format_event(event):
+    """
+    Format an event as a compact csv record, fixations start with F and saccades with S
+    """
+    if isinstance(event, Fixation):
+        return f'F,{event.start:.3f},{event.duration:.3f},{event.x:.1f},{event.y:.1f},{event.samples}'
+    return (f'S,{event.start:.3f},{event.duration:.3f},{event.x0:.1f},{event.y0:.1f},'
+            f'{event.x1:.1f},{event.y1:.1f},{event.samples}')
+
+class IVTDetector:
+    """
+    Velocity-threshold (I-VT) detector
+
+    Consecutive samples moving slower than the velocity threshold are grouped into fixations,
+    the rest into saccades. Fixations shorter than min_duration are dropped.
+
+    Parameters:
+        velocity (float, optional): threshold in gaze units per second. defaults to 1000
+        min_duration (float, optional): shortest fixation in seconds. defaults to 0.1
+    """
+    def __init__(self, velocity=1000, min_duration=0.1):
+        self.velocity = velocity
+        self.min_duration = min_duration
+        self.prev = None
+        self.fixating = True
+        self._reset(None)
+
+    def _reset(self, sample):
+        self.first = sample
+        self.last = sample
+        self.count = 0
+        self.sum_x = 0
+        self.sum_y = 0
+
+    def _close(self):
+        if not self.count:
+            return None
+        start, x0, y0 = self.first
+        duration = self.last[0] - start
+        if self.fixating:
+            if duration < self.min_duration:
+                return None
+            return Fixation(start, duration, self.sum_x / self.count, self.sum_y / self.count, self.count)
+        return Saccade(start, duration, x0, y0, self.last[1], self.last[2], self.count)
+
+    def add(self, t, x, y):
+        """
+        Add a sample, returning the events it completes
+        """
+        fixating = self.fixating
+        if self.prev is not None:
+            pt, px, py = self.prev
+            dt = t - pt
+            if dt > 0:
+                fixating = math.hypot(x - px, y - py) / dt < self.velocity
+        self.prev = (t, x, y)
+
+        events = NO_EVENTS
+        if fixating != self.fixating:
+            event = self._close()
+            events = (event,) if event else NO_EVENTS
+            self.fixating = fixating
+            self._reset(self.prev)
+        elif not self.count:
+            self.first = self.prev
+
+        self.last = self.prev
+        self.count += 1
+        self.sum_x += x
+        self.sum_y += y
+        return events
+
+    def flush(self):
+        """
+        Close the event in progress, returning it if it is complete
+        """
+        event = self._close()
+        self._reset(None)
+        return (event,) if event else NO_EVENTS
+
+class IDTDetector:
+    """
+    Dispersion-threshold (I-DT) detector
+
+    A window covering min_duration whose dispersion, (max x - min x) + (max y - min y), stays
+    within the threshold starts a fixation, which grows until a sample would exceed it. Samples
+    dropped from the front of the window in between form saccades. Window extremes are kept in
+    monotonic queues so each sample costs constant amortized time.
+
+    Parameters:
+        dispersion (float, optional): threshold in gaze units. defaults to 50
+        min_duration (float, optional): shortest fixation in seconds. defaults to 0.1
+    """
+    def __init__(self, dispersion=50, min_duration=0.1):
+        self.dispersion = dispersion
+        self.min_duration = min_duration
+        self.window = deque()
+        self.fixating = False
+        self.seq = 0
+        self.sum_x = 0
+        self.sum_y = 0
+        self.saccade = None
+        self._clear()
+
+    def _clear(self):
+        self.window.clear()
+        self.min_x, self.max_x = deque(), deque()
+        self.min_y, self.max_y = deque(), deque()
+        self.sum_x = 0
+        self.sum_y = 0
+
+    def _push(self, sample):
+        seq, _, x, y = sample
+        self.window.append(sample)
+        self.sum_x += x
+        self.sum_y += y
+        for extremes, value, lower in ((self.min_x, x, True), (self.max_x, x, False),
+                                       (self.min_y, y, True), (self.max_y, y, False)):
+            while extremes and (extremes[-1][1] >= value if lower else extremes[-1][1] <= value):
+                extremes.pop()
+            extremes.append((seq, value))
+
+    def _pop(self):
+        sample = self.window.popleft()
+        seq, _, x, y = sample
+        self.sum_x -= x
+        self.sum_y -= y
+        for extremes in (self.min_x, self.max_x, self.min_y, self.max_y):
+            if extremes[0][0] == seq:
+                extremes.popleft()
+        return sample
+
+    def _spread(self):
+        return (self.max_x[0][1] - self.min_x[0][1]) + (self.max_y[0][1] - self.min_y[0][1])
+
+    def _fixation(self):
+        _, start, _, _ = self.window[0]
+        duration = self.window[-1][1] - start
+        count = len(self.window)
+        return Fixation(start, duration, self.sum_x / count, self.sum_y / count, count)
+
+    def _drop(self):
+        _, t, x, y = self._pop()
+        if self.saccade is None:
+            self.saccade = [t, t, x, y, x, y, 0]
+        saccade = self.saccade
+        saccade[1], saccade[4], saccade[5] = t, x, y
+        saccade[6] += 1
+
+    def _search(self, events):
+        # slide the window until it covers min_duration within the dispersion threshold
+        while self.window and self.window[-1][1] - self.window[0][1] >= self.min_duration:
+            if self._spread() <= self.dispersion:
+                self.fixating = True
+                if self.saccade is not None:
+                    start, _, x0, y0, x1, y1, count = self.saccade
+                    events.append(Saccade(start, self.window[0][1] - start, x0, y0, x1, y1, count))
+                    self.saccade = None
+                return
+            self._drop()
+
+    def add(self, t, x, y):
+        """
+        Add a sample, returning the events it completes
+        """
+        sample = (self.seq, t, x, y)
+        self.seq += 1
+        self._push(sample)
+        if not self.fixating:
+            if self.window[-1][1] - self.window[0][1] < self.min_duration:
+                return NO_EVENTS
+            events = []
+            self._search(events)
+            return events
+
+        if self._spread() <= self.dispersion:
+            return NO_EVENTS
+
+        # the new sample ends the fixation and starts the next window
+        self.window.pop()
+        self.sum_x -= x
+        self.sum_y -= y
+        events = [self._fixation()]
+        self._clear()
+        self.fixating = False
+        self._push(sample)
+        self._search(events)
+        return events
+
+    def flush(self):
+        """
+        Close the event in progress, returning it if it is complete
+        """
+        events = []
+        if self.fixating:
+            events.append(self._fixation())
+        else:
+            while self.window:
+                self._drop()
+            if self.saccade is not None:
+                start, end, x0, y0, x1, y1, count = self.saccade
+                events.append(Saccade(start, end - start, x0, y0, x1, y1, count))
+        self.saccade = None
+        self.fixating = False
+        self._clear()
+        return events
+
+DETECTORS = {
+    'ivt': IVTDetector,
+    'idt': IDTDetector,
+}
+
+class GazeRecorder:
+    """
+    Writer that turns gaze samples into event records
+
+    Samples are passed in directly with write_sample, or as text lines through the file-like
+    write, which buffers partial writes and handles one line at a time. Without a detector,
+    samples are written through as raw lines.
+
+    Parameters:
+        handle (file): file to write events to
+        detector (IVTDetector | IDTDetector, optional): event detector. defaults to none
+        raw_handle (file, optional): file to also write raw sample lines to. defaults to none
+        parse (function, optional): parser of text lines into samples with timestamps in
+            seconds. defaults to parse_sample
+    """
+    def __init__(self, handle, detector=None, raw_handle=None, parse=parse_sample):
+        self.handle = handle
+        self.detector = detector
+        self.raw_handle = raw_handle
+        self.parse = parse
+        self.buffer = ''
+        self.samples = 0
+        self.events = 0
+        # characters written to handle, counted instead of asking the file, which would flush it
+        self.written = 0
+
+    def write(self, text):
+        self.buffer += text
+        if '\n' in self.buffer:
+            *lines, self.buffer = self.buffer.split('\n')
+            for line in lines:
+                self.write_line(line)
+        return len(text)
+
+    def write_line(self, line):
+        if self.detector is None:
+            self.written += self.handle.write(line + '\n')
+            GAZE_SAMPLES.inc()
+            return
+        if self.raw_handle:
+            self.raw_handle.write(line + '\n')
+
+        sample = self.parse(line)
+        if sample is None:
+            return
+        t, x, y = sample
+        self.samples += 1
+        GAZE_SAMPLES.inc()
+        self._write_events(self.detector.add(t, x, y))
+
+    def write_sample(self, t, x, y):
+        """
+        Record a sample whose timestamp is already in seconds
+        """
+        if self.detector is None:
+            self.written += self.handle.write(f'{t:.4f}, {x:g}, {y:g}\n')
+            GAZE_SAMPLES.inc()
+            return
+        if self.raw_handle:
+            self.raw_handle.write(f'{t:.4f}, {x:g}, {y:g}\n')
+
+        self.samples += 1
+        GAZE_SAMPLES.inc()
+        self._write_events(self.detector.add(t, x, y))
+
+    def _write_events(self, events):
+        for event in events:
+            self.written += self.handle.write(format_event(event) + '\n')
+            self.events += 1
+            GAZE_EVENTS.inc()
+
+    def flush(self):
+        self.handle.flush()
+        if self.raw_handle:
+            self.raw_handle.flush()
+
+    def close(self):
+        """
+        Write any buffered line and the event in progress, leaving the files open
+        """
+        if self.buffer:
+            self.write_line(self.buffer)
+            self.buffer = ''
+        if self.detector is not None:
+            self._write_events(self.detector.flush())
+        self.flush()
+
+
+class CountingFile:
+    def __init__(self):
+        self.size = 0
+
+    def write(self, text):
+        self.size += len(text)
+        return len(text)
+
+    def flush(self):
+        pass
+
+def benchmark(path, detector, parse=parse_sample):
+    """
+    Summarize a recording, measuring output size and CPU time
+
+    Returns:
+        report (dict): sizes in bytes, sample and event counts, and CPU microseconds per sample
+    """
+    with open(path) as f:
+        lines = f.readlines()
+
+    out = CountingFile()
+    recorder = GazeRecorder(out, detector, parse=parse)
+    start = time.process_time()
+    for line in lines:
+        recorder.write(line)
+    recorder.close()
+    cpu = time.process_time() - start
+
+    raw = os.path.getsize(path)
+    return {
+        'file': path,
+        'raw_bytes': raw,
+        'event_bytes': out.size,
+        'ratio': out.size / raw if raw else 0,
+        'samples': recorder.samples,
+        'events': recorder.events,
+        'cpu_us_per_sample': 1e6 * cpu / recorder.samples if recorder.samples else 0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark fixation/saccade summarization of gaze recordings')
+    parser.add_argument('recordings', nargs='+', help='gaze csv files')
+    parser.add_argument('--detector', choices=sorted(DETECTORS), default='idt')
+    parser.add_argument('--velocity', type=float, default=1000, help='I-VT threshold in gaze units per second')
+    parser.add_argument('--dispersion', type=float, default=50, help='I-DT threshold in gaze units')
+    parser.add_argument('--min-duration', type=float, default=0.1, help='shortest fixation in seconds')
+    parser.add_argument('--format', choices=['csv', 'tobii'], default='csv',
+                        help='csv for "t, x, y" lines with t in seconds, tobii for Interaction_Streams_101 output')
+    args = parser.parse_args(argv)
+
+    for path in args.recordings:
+        if args.detector == 'ivt':
+            detector = IVTDetector(args.velocity, args.min_duration)
+        else:
+            detector = IDTDetector(args.dispersion, args.min_duration)
+        report = benchmark(path, detector, TobiiParser() if args.format == 'tobii' else parse_sample)
+        print(f"{report['file']}: {report['samples']} samples -> {report['events']} events, "
+              f"{report['raw_bytes']} -> {report['event_bytes']} bytes ({100 * report['ratio']:.1f}%), "
+              f"{report['cpu_us_per_sample']:.1f} us/sample")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""
+Gaze sources and the ring buffer their samples are shared through
+
+Every backend pushes (t, x, y) samples, t in seconds, into a fixed-size GazeRing. Any number of
+consumers read from the ring through their own GazeReader, which hands out memoryviews over the
+ring's arrays instead of copies. What x and y mean depends on the backend: screen coordinates
+for Tobii and synthetic sources, the left and right eye directions (-1, 0 or 1) for the webcam.
+"""
+import math
+import random
+import time
+
+from array import array
+from threading import Thread
+
+from GazeEvents import TobiiParser
+
+class GazeRing:
+    """
+    Fixed-size buffer of timestamped gaze samples with a single writer and any number of readers
+
+    Parameters:
+        capacity (int, optional): number of samples kept. defaults to 4096
+    """
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self.t = array('d', bytes(8 * capacity))
+        self.x = array('d', bytes(8 * capacity))
+        self.y = array('d', bytes(8 * capacity))
+        self._views = (memoryview(self.t), memoryview(self.x), memoryview(self.y))
+        # number of samples ever pushed, only advanced after a sample is fully written
+        self.seq = 0
+
+    def push(self, t, x, y):
+        i = self.seq % self.capacity
+        self.t[i] = t
+        self.x[i] = x
+        self.y[i] = y
+        self.seq += 1
+
+    def latest(self):
+        """
+        Return the most recent sample as (t, x, y), or None if nothing was pushed yet
+        """
+        seq = self.seq
+        if not seq:
+            return None
+        i = (seq - 1) % self.capacity
+        return self.t[i], self.x[i], self.y[i]
+
+    def views(self, start, end):
+        """
+        Return the samples from sequence number start up to end as (t, x, y) memoryviews
+
+        Returns:
+            chunks (list[tuple[memoryview]]): one chunk, or two when the range wraps around
+        """
+        i = start % self.capacity
+        count = end - start
+        t, x, y = self._views
+        if i + count <= self.capacity:
+            return [(t[i:i + count], x[i:i + count], y[i:i + count])]
+        rest = i + count - self.capacity
+        return [(t[i:], x[i:], y[i:]), (t[:rest], x[:rest], y[:rest])]
+
+    def reader(self, latest=True):
+        """
+        Create a reader starting at the next sample, or at the oldest kept sample if not latest
+        """
+        return GazeReader(self, self.seq if latest else max(self.seq - self.capacity, 0))
+
+class GazeReader:
+    """
+    Cursor of one consumer into a GazeRing
+
+    Views returned by read stay valid until the writer laps them, capacity samples later, so
+    consumers should be done with a batch before reading again. Samples overwritten before
+    they were read are skipped and counted in dropped.
+    """
+    def __init__(self, ring, seq):
+        self.ring = ring
+        self.seq = seq
+        self.dropped = 0
+
+    def pending(self):
+        return self.ring.seq - self.seq
+
+    def read(self, limit=None):
+        """
+        Return the samples pushed since the last read
+
+        Parameters:
+            limit (int, optional): most samples to return. defaults to all pending samples
+
+        Returns:
+            chunks (list[tuple[memoryview]]): (t, x, y) views, see GazeRing.views
+        """
+        end = self.ring.seq
+        start = self.seq
+        if end - start > self.ring.capacity:
+            self.dropped += end - start - self.ring.capacity
+            start = end - self.ring.capacity
+        if limit is not None and end - start > limit:
+            end = start + limit
+        self.seq = end
+        if end == start:
+            return []
+        return self.ring.views(start, end)
+
+def iter_samples(chunks):
+    """
+    Iterate over the (t, x, y) samples of the chunks returned by GazeReader.read
+    """
+    for t, x, y in chunks:
+        yield from zip(t, x, y)
+
+
+class GazeSource:
+    """
+    Base class of gaze backends, subclasses produce samples in run until stop is called
+    """
+    # whether x and y are eye directions rather than screen coordinates
+    directions = False
+
+    def __init__(self, capacity=4096):
+        self.ring = GazeRing(capacity)
+        self.running = False
+        self.started = 0
+        self._thread = None
+
+    def start(self):
+        self.running = True
+        self.started = time.perf_counter()
+        self._thread = Thread(target=self.run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def run(self):
+        raise NotImplementedError
+
+    def stop(self):
+        self.running = False
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def push(self, t, x, y):
+        self.ring.push(t, x, y)
+
+class TobiiSource(GazeSource):
+    """
+    Gaze samples printed by the Tobii Interaction_Streams_101 executable
+
+    Samples are timestamped with the clock time the executable prints, in seconds, and keep
+    counting up when its 12-hour clock wraps around during a recording.
+
+    Parameters:
+        exec_path (str): path of the executable
+        on_line (function, optional): called with every line printed, as printed. defaults to none
+    """
+    def __init__(self, exec_path, on_line=None, capacity=4096):
+        super().__init__(capacity)
+        self.exec_path = exec_path
+        self.on_line = on_line
+        self.process = None
+
+    def start(self):
+        import subprocess
+
+        self.process = subprocess.Popen(
+            [self.exec_path, '-l'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+        )
+        return super().start()
+
+    def run(self):
+        parse = TobiiParser()
+        for line in self.process.stdout:
+            if self.on_line:
+                self.on_line(line)
+            sample = parse(line)
+            if sample is not None:
+                self.push(*sample)
+
+    def stop(self):
+        import signal
+
+        if self.process:
+            self.process.send_signal(signal.CTRL_C_EVENT)
+        super().stop()
+        self.process = None
+
+class WebcamSource(GazeSource):
+    """
+    Eye directions detected by Webcam, one sample per processed frame
+
+    Parameters:
+        options: keyword arguments for Webcam, e.g. its idle duty cycling bounds
+    """
+    directions = True
+
+    def __init__(self, capacity=4096, **options):
+        super().__init__(capacity)
+        self.options = options
+        self.webcam = None
+        self.origin = None
+
+    def start(self):
+        from Webcam import Webcam
+
+        self.webcam = Webcam(on_eye_pos=self.on_eye_pos, **self.options)
+        # the webcam may be started and stopped repeatedly, timestamps count from the first start
+        if self.origin is None:
+            self.origin = time.perf_counter()
+        return super().start()
+
+    def run(self):
+        self.webcam.run()
+
+    def on_eye_pos(self, eye_pos):
+        self.push(time.perf_counter() - self.origin, eye_pos[0], eye_pos[1])
+
+    def stop(self):
+        if self.webcam:
+            self.webcam.terminate()
+        super().stop()
+        self.webcam = None
+
+class SyntheticSource(GazeSource):
+    """
+    Generated fixations joined by saccades, for running without eye tracking hardware
+
+    Parameters:
+        rate (float, optional): samples per second. defaults to 60
+        realtime (boolean, optional): pace samples at rate instead of as fast as possible.
+            defaults to true
+        duration (float, optional): seconds of samples to generate, endless if none. defaults to none
+        seed (int, optional): random seed, for reproducible samples. defaults to none
+        screen (tuple[int], optional): width and height fixations are spread over. defaults to 1920x1080
+        fixation (tuple[float], optional): shortest and longest fixation in seconds. defaults to 0.15-0.6
+        saccade (float, optional): saccade duration in seconds. defaults to 0.04
+        noise (float, optional): standard deviation of samples around a fixation. defaults to 3
+
+    The fixations generated are kept in fixations as (start, end, x, y), to check detectors against.
+    """
+    def __init__(self, rate=60, realtime=True, duration=None, seed=None, screen=(1920, 1080),
+                 fixation=(0.15, 0.6), saccade=0.04, noise=3, capacity=4096):
+        super().__init__(capacity)
+        self.rate = rate
+        self.realtime = realtime
+        self.duration = duration
+        self.random = random.Random(seed)
+        self.screen = screen
+        self.fixation = fixation
+        self.saccade = saccade
+        self.noise = noise
+        self.fixations = []
+
+    def samples(self):
+        """
+        Generate (t, x, y) samples on the source's own clock
+        """
+        rand = self.random
+        width, height = self.screen
+        i = 0
+        x, y = width / 2, height / 2
+        while self.duration is None or i / self.rate < self.duration:
+            start = i
+            for _ in range(max(int(rand.uniform(*self.fixation) * self.rate), 1)):
+                yield i / self.rate, rand.gauss(x, self.noise), rand.gauss(y, self.noise)
+                i += 1
+            self.fixations.append((start / self.rate, (i - 1) / self.rate, x, y))
+
+            nx, ny = rand.uniform(0, width), rand.uniform(0, height)
+            steps = max(int(math.ceil(self.saccade * self.rate)), 1)
+            for step in range(1, steps + 1):
+                yield i / self.rate, x + (nx - x) * step / (steps + 1), y + (ny - y) * step / (steps + 1)
+                i += 1
+            x, y = nx, ny
+
+    def run(self):
+        for t, x, y in self.samples():
+            if not self.running:
+                break
+            if self.realtime:
+                delay = self.started + t - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.push(t, x, y)
+        self.running = False
@@ -0,0 +1,249 @@
+"""
+Headless load generator for the MultiCraftTextServer and gaze receiver
+
+Simulates concurrent players sending scripted commands and gaze uploads through the same
+functions the client uses, then reports throughput, error rate and latency. Without --url,
+local stub servers are started so the whole run stays offline.
+
+    python LoadTest.py --players 20 --duration 30 --command-rate 2 --gaze-rate 0.2
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import tempfile
+import time
+import uuid
+
+from threading import Event, Lock, Thread
+
+import ClientNet
+from Metrics import percentile
+from StubServers import StubGazeReceiver, StubTextServer
+
+DEFAULT_SCRIPT = [
+    'build a house',
+    'place a block',
+    'move forward',
+    'turn left',
+    'tilt up',
+    'track move',
+    'undo',
+    'redo',
+    'store this',
+    'clone that',
+    'give me a sword',
+    'track build',
+]
+
+class Stats:
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = {}
+        self.lag = 0
+        self.lock = Lock()
+
+    def record(self, latency, error=None, lag=0):
+        with self.lock:
+            self.latencies.append(latency)
+            self.lag = max(self.lag, lag)
+            if error is not None:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, elapsed):
+        with self.lock:
+            ordered = sorted(self.latencies)
+            errors = dict(self.errors)
+            lag = self.lag
+
+        count = len(ordered)
+        failed = sum(errors.values())
+        return {
+            'name': self.name,
+            'requests': count,
+            'errors': failed,
+            'error_rate': failed / count if count else 0,
+            'error_types': errors,
+            'throughput': count / elapsed if elapsed else 0,
+            'latency_ms': {
+                'mean': 1000 * sum(ordered) / count if count else 0,
+                'p50': 1000 * percentile(ordered, 50),
+                'p90': 1000 * percentile(ordered, 90),
+                'p99': 1000 * percentile(ordered, 99),
+                'max': 1000 * (ordered[-1] if ordered else 0),
+            },
+            'max_schedule_lag_ms': 1000 * lag,
+        }
+
+def run_at_rate(rate, deadline, stop, stats, action):
+    """
+    Call action at a fixed rate until the deadline, recording each call's latency in stats
+
+    Calls are scheduled open-loop, so a slow server shows up as schedule lag instead of a lower
+    offered load.
+    """
+    if rate <= 0:
+        return
+
+    interval = 1 / rate
+    start = time.perf_counter()
+    i = 0
+    while not stop.is_set():
+        scheduled = start + i * interval
+        if scheduled >= deadline:
+            break
+        now = time.perf_counter()
+        if scheduled > now:
+            stop.wait(scheduled - now)
+            if stop.is_set():
+                break
+
+        began = time.perf_counter()
+        error = None
+        try:
+            action(i)
+        except Exception as e:
+            error = type(e).__name__
+        stats.record(time.perf_counter() - began, error, began - scheduled)
+        i += 1
+
+class Player:
+    def __init__(self, index, args, gaze_csv, command_stats, gaze_stats, stop):
+        self.index = index
+        self.args = args
+        self.name = str(uuid.uuid4())
+        self.gaze_csv = gaze_csv
+        self.command_stats = command_stats
+        self.gaze_stats = gaze_stats
+        self.stop = stop
+        self.threads = []
+
+    def send_command(self, i):
+        script = self.args.script
+        transcript = script[(self.index + i) % len(script)]
+        ClientNet.send_command(self.args.url, self.name, transcript, self.args.server, timeout=self.args.timeout)
+
+    def send_gaze_data(self, i):
+        ClientNet.send_gaze_data(self.gaze_csv, self.args.gaze_host, self.args.gaze_port)
+
+    def start(self, deadline):
+        self.threads = [
+            Thread(target=run_at_rate, args=(self.args.command_rate, deadline, self.stop, self.command_stats, self.send_command), daemon=True),
+            Thread(target=run_at_rate, args=(self.args.gaze_rate, deadline, self.stop, self.gaze_stats, self.send_gaze_data), daemon=True),
+        ]
+        for th in self.threads:
+            th.start()
+
+    def join(self):
+        for th in self.threads:
+            th.join()
+
+def write_gaze_csv(path, size):
+    """
+    Write a synthetic gaze recording of roughly the given size in bytes
+    """
+    with open(path, 'w') as f:
+        written = 0
+        t = 0
+        while written < size:
+            line = f'{t:.4f}, 0, 0\n'
+            f.write(line)
+            written += len(line)
+            t += 1 / 60
+
+def print_summary(summary):
+    latency = summary['latency_ms']
+    print(f"{summary['name']}: {summary['requests']} requests, {summary['throughput']:.1f}/s, "
+          f"{summary['errors']} errors ({100 * summary['error_rate']:.1f}%)")
+    print(f"  latency ms: mean {latency['mean']:.1f}, p50 {latency['p50']:.1f}, p90 {latency['p90']:.1f}, "
+          f"p99 {latency['p99']:.1f}, max {latency['max']:.1f}")
+    print(f"  max schedule lag ms: {summary['max_schedule_lag_ms']:.1f}")
+    for error, count in sorted(summary['error_types'].items()):
+        print(f'  {error}: {count}')
+
+def run(args):
+    stubs = []
+    if not args.url:
+        text_server = StubTextServer(delay=args.stub_delay, error_rate=args.stub_error_rate).start()
+        args.url = text_server.url
+        stubs.append(text_server)
+    if not args.gaze_host:
+        gaze_receiver = StubGazeReceiver().start()
+        args.gaze_host, args.gaze_port = gaze_receiver.host, gaze_receiver.port
+        stubs.append(gaze_receiver)
+    if args.server is None:
+        args.server = args.gaze_host
+
+    # same default timeout the client sets when connecting
+    socket.setdefaulttimeout(args.timeout)
+
+    command_stats = Stats('commands')
+    gaze_stats = Stats('gaze uploads')
+    stop = Event()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        gaze_csv = os.path.join(tmp, 'gaze.csv')
+        write_gaze_csv(gaze_csv, args.gaze_bytes)
+
+        players = [Player(i, args, gaze_csv, command_stats, gaze_stats, stop) for i in range(args.players)]
+        start = time.perf_counter()
+        deadline = start + args.duration
+        for player in players:
+            player.start(deadline)
+        try:
+            for player in players:
+                player.join()
+            # the last calls are scheduled before the deadline, the run still lasts its duration
+            stop.wait(max(deadline - time.perf_counter(), 0))
+        except KeyboardInterrupt:
+            stop.set()
+            for player in players:
+                player.join()
+        elapsed = time.perf_counter() - start
+
+    for stub in stubs:
+        stub.stop()
+
+    return [command_stats.summary(elapsed), gaze_stats.summary(elapsed)]
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate concurrent MultiCraftClients')
+    parser.add_argument('--players', type=int, default=10, help='number of simulated players')
+    parser.add_argument('--duration', type=float, default=10, help='length of the run in seconds')
+    parser.add_argument('--command-rate', type=float, default=1, help='commands per second per player')
+    parser.add_argument('--gaze-rate', type=float, default=0.1, help='gaze uploads per second per player')
+    parser.add_argument('--gaze-bytes', type=int, default=64 * 1024, help='size of each gaze upload')
+    parser.add_argument('--script', help='file with one command per line, cycled by every player')
+    parser.add_argument('--url', help='MultiCraftTextServer endpoint, a local stub is used if omitted')
+    parser.add_argument('--gaze-host', help='gaze receiver address, a local stub is used if omitted')
+    parser.add_argument('--gaze-port', type=int, default=ClientNet.GAZE_PORT)
+    parser.add_argument('--server', help='server value sent with each command, defaults to the gaze host')
+    parser.add_argument('--timeout', type=float, default=5)
+    parser.add_argument('--stub-delay', type=float, default=0, help='seconds the stub TextServer waits per request')
+    parser.add_argument('--stub-error-rate', type=float, default=0, help='fraction of stub TextServer requests that fail')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args(argv)
+
+    if args.script:
+        with open(args.script) as f:
+            args.script = [line.strip() for line in f if line.strip()]
+    if not args.script:
+        args.script = DEFAULT_SCRIPT
+
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    summaries = run(args)
+
+    if args.json:
+        json.dump(summaries, sys.stdout, indent=2)
+        print()
+    else:
+        for summary in summaries:
+            print_summary(summary)
+
+if __name__ == '__main__':
+    main()
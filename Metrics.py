@@ -0,0 +1,196 @@
+"""
+Lightweight runtime metrics for the client
+
+Counters, gauges and histograms are module-level objects updated in place from the hot paths.
+Updates take no locks: they run under the GIL and each metric is mostly written from a single
+thread, so at worst a concurrent update is lost. Metrics can be served to localhost in the
+Prometheus text format and summarized in a periodic log line.
+"""
+import math
+import time
+
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Thread
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+REGISTRY = {}
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self):
+        yield self.name, '', self.value
+
+class Gauge:
+    kind = 'gauge'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self):
+        yield self.name, '', self.value
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{self.name}_bucket', f'{{le="{bound}"}}', cumulative
+        yield f'{self.name}_bucket', '{le="+Inf"}', self.count
+        yield f'{self.name}_sum', '', self.sum
+        yield f'{self.name}_count', '', self.count
+
+def percentile(ordered, p):
+    """
+    Nearest-rank percentile of an already sorted list
+
+    Parameters:
+        ordered (list[float]): sorted values
+        p (float): percentile between 0 and 100
+
+    Returns:
+        value (float): the percentile, or 0 if there are no values
+    """
+    if not ordered:
+        return 0
+    rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+def _register(cls, name, help, *args):
+    metric = REGISTRY.get(name)
+    if metric is None:
+        metric = REGISTRY[name] = cls(name, help, *args)
+    return metric
+
+def counter(name, help):
+    return _register(Counter, name, help)
+
+def gauge(name, help):
+    return _register(Gauge, name, help)
+
+def histogram(name, help, buckets=LATENCY_BUCKETS):
+    return _register(Histogram, name, help, buckets)
+
+def render():
+    """
+    Render every metric in the Prometheus text exposition format
+    """
+    lines = []
+    for metric in list(REGISTRY.values()):
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples():
+            lines.append(f'{name}{labels} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def serve(port, host='127.0.0.1'):
+    """
+    Serve the metrics over HTTP from a background thread
+
+    Parameters:
+        port (int): port to listen on, 0 picks a free port
+        host (str, optional): address to bind to. defaults to localhost
+
+    Returns:
+        server (HTTPServer): the running server
+    """
+    server = HTTPServer((host, port), MetricsHandler)
+    Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    return server
+
+class Summary:
+    """
+    One-line summary of the change in every metric since the previous line
+
+    Counters are shown as rates, gauges as their current value and histograms as the mean of
+    the values observed since the previous line.
+    """
+    def __init__(self):
+        self.previous = {}
+        self.time = time.perf_counter()
+
+    def line(self):
+        now = time.perf_counter()
+        elapsed = now - self.time
+        self.time = now
+
+        parts = []
+        for metric in list(REGISTRY.values()):
+            if metric.kind == 'counter':
+                value = metric.value
+                previous = self.previous.get(metric.name, 0)
+                self.previous[metric.name] = value
+                parts.append(f'{metric.name}={(value - previous) / elapsed if elapsed else 0:.1f}/s')
+            elif metric.kind == 'gauge':
+                parts.append(f'{metric.name}={metric.value:g}')
+            else:
+                count, total = metric.count, metric.sum
+                previous_count, previous_total = self.previous.get(metric.name, (0, 0))
+                self.previous[metric.name] = (count, total)
+                observed = count - previous_count
+                mean = (total - previous_total) / observed if observed else 0
+                parts.append(f'{metric.name}={1000 * mean:.1f}ms(n={observed})')
+        return 'metrics: ' + ' '.join(parts)
+
+def log_periodically(interval, log=print):
+    """
+    Log a summary line every interval seconds from a background thread
+    """
+    def run():
+        summary = Summary()
+        while True:
+            time.sleep(interval)
+            log(summary.line())
+
+    th = Thread(target=run, name='metrics-log', daemon=True)
+    th.start()
+    return th
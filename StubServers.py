@@ -0,0 +1,342 @@
+import base64
+import hashlib
+import json
+import random
+import re
+import socketserver
+import struct
+import time
+
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from threading import Lock, Thread, Timer
+from urllib.parse import parse_qs, urlparse
+
+class ThreadingHTTPServer(socketserver.ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class ThreadingTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class StubServer:
+    """
+    Base class for local stand-ins of the MultiCraft server endpoints, served from a background thread
+    """
+    def __init__(self, server):
+        self.server = server
+        self.server.stub = self
+        self.host, self.port = self.server.server_address[:2]
+        self.lock = Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = Thread(target=self.server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if self._thread:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class TextServerHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        stub = self.server.stub
+        query = parse_qs(urlparse(self.path).query)
+
+        if stub.delay:
+            time.sleep(stub.delay)
+
+        with stub.lock:
+            failed = stub.error_rate and stub.random.random() < stub.error_rate
+            if failed:
+                stub.errors += 1
+            else:
+                stub.commands.append((query.get('uuid', [''])[0], query.get('transcript', [''])[0]))
+
+        self.send_response(500 if failed else 200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class StubTextServer(StubServer):
+    """
+    Stand-in for the MultiCraftTextServer, records every command it receives
+
+    Parameters:
+        host (str, optional): address to bind to. defaults to localhost
+        port (int, optional): port to bind to. defaults to an ephemeral port
+        delay (float, optional): seconds to wait before answering each request. defaults to 0
+        error_rate (float, optional): fraction of requests answered with HTTP 500. defaults to 0
+    """
+    def __init__(self, host='127.0.0.1', port=0, delay=0, error_rate=0, seed=None):
+        super().__init__(ThreadingHTTPServer((host, port), TextServerHandler))
+        self.delay = delay
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.commands = []
+        self.errors = 0
+
+    @property
+    def url(self):
+        return f'http://{self.host}:{self.port}/'
+
+
+class GazeReceiverHandler(socketserver.BaseRequestHandler):
+    def handle(self):
+        stub = self.server.stub
+        received = 0
+        while True:
+            data = self.request.recv(65536)
+            if not data:
+                break
+            received += len(data)
+
+        with stub.lock:
+            stub.uploads += 1
+            stub.bytes_received += received
+
+class StubGazeReceiver(StubServer):
+    """
+    Stand-in for the gaze receiver, counts uploads and bytes received
+
+    Parameters:
+        host (str, optional): address to bind to. defaults to localhost
+        port (int, optional): port to bind to. defaults to an ephemeral port
+    """
+    def __init__(self, host='127.0.0.1', port=0):
+        super().__init__(ThreadingTCPServer((host, port), GazeReceiverHandler))
+        self.uploads = 0
+        self.bytes_received = 0
+
+
+WS_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+WS_CONTINUATION, WS_TEXT, WS_BINARY, WS_CLOSE, WS_PING, WS_PONG = 0x0, 0x1, 0x2, 0x8, 0x9, 0xA
+
+class SpeechToTextHandler(socketserver.StreamRequestHandler):
+    """
+    Minimal websocket endpoint speaking the Speech to Text recognize protocol
+    """
+    def handle(self):
+        self.stub = self.server.stub
+        self.send_lock = Lock()
+        self.closing = False
+        self.timers = []
+        if not self.handshake():
+            return
+
+        self.session = self.stub.open_session()
+        while True:
+            frame = self.read_message()
+            if frame is None:
+                break
+            opcode, payload = frame
+            if opcode == WS_CLOSE:
+                if not self.closing:
+                    self.send_frame(WS_CLOSE, payload[:2])
+                break
+            elif opcode == WS_PING:
+                self.send_frame(WS_PONG, payload)
+            elif opcode == WS_BINARY:
+                self.on_audio(payload)
+            elif opcode == WS_TEXT:
+                self.on_action(json.loads(payload.decode('utf-8')))
+
+    def handshake(self):
+        headers = {}
+        request_line = self.rfile.readline()
+        if not request_line:
+            return False
+        while True:
+            line = self.rfile.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        key = headers.get('sec-websocket-key')
+        if not key:
+            self.wfile.write(b'HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n')
+            return False
+
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode('latin-1')).digest()).decode('latin-1')
+        self.wfile.write(
+            'HTTP/1.1 101 Switching Protocols\r\n'
+            'Upgrade: websocket\r\n'
+            'Connection: Upgrade\r\n'
+            f'Sec-WebSocket-Accept: {accept}\r\n\r\n'.encode('latin-1')
+        )
+        return True
+
+    def read_frame(self):
+        header = self.rfile.read(2)
+        if len(header) < 2:
+            return None
+        fin = header[0] & 0x80
+        opcode = header[0] & 0x0F
+        masked = header[1] & 0x80
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', self.rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', self.rfile.read(8))[0]
+        mask = self.rfile.read(4) if masked else None
+        payload = self.rfile.read(length)
+        if mask:
+            mask = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, 'big') ^ int.from_bytes(mask, 'big')).to_bytes(length, 'big')
+        return fin, opcode, payload
+
+    def read_message(self):
+        frame = self.read_frame()
+        if frame is None:
+            return None
+        fin, opcode, payload = frame
+        while not fin:
+            frame = self.read_frame()
+            if frame is None:
+                return None
+            fin, _, more = frame
+            payload += more
+        return opcode, payload
+
+    def send_frame(self, opcode, payload):
+        length = len(payload)
+        if length < 126:
+            header = struct.pack('!BB', 0x80 | opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack('!BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('!BBQ', 0x80 | opcode, 127, length)
+        with self.send_lock:
+            try:
+                self.wfile.write(header + payload)
+            except OSError:
+                pass
+
+    def send_json(self, message):
+        self.send_frame(WS_TEXT, json.dumps(message).encode('utf-8'))
+
+    def send_result(self, result):
+        alternative = {'transcript': result['transcript'], 'confidence': 0.9}
+        if result['final'] and self.session.timestamps:
+            # words a third of a second long, the last one ending at the scripted time
+            words = result['transcript'].split()
+            bounds = [max(result['at'] - (len(words) - i) / 3, 0) for i in range(len(words) + 1)]
+            alternative['timestamps'] = [[word, bounds[i], bounds[i + 1]] for i, word in enumerate(words)]
+        message = {
+            'result_index': result['result_index'],
+            'results': [{'final': result['final'], 'alternatives': [alternative]}],
+        }
+
+        # delayed results still go out in order, each after the one before it
+        previous = self.timers[-1] if self.timers else None
+        def send():
+            if previous:
+                previous.join()
+            result['sent'] = time.perf_counter()
+            self.send_json(message)
+
+        if self.stub.delay:
+            timer = Timer(self.stub.delay, send)
+            self.timers.append(timer)
+            timer.start()
+        else:
+            send()
+
+    def on_action(self, message):
+        action = message.get('action')
+        if action == 'start':
+            rate = re.search(r'rate=(\d+)', message.get('content-type', ''))
+            self.session.rate = int(rate.group(1)) if rate else self.session.rate
+            self.session.timestamps = bool(message.get('timestamps'))
+            self.send_json({'state': 'listening'})
+        elif action == 'stop':
+            for result in self.session.pending(None):
+                self.send_result(result)
+            for timer in self.timers:
+                timer.join()
+            self.send_json({'state': 'listening'})
+            self.closing = True
+            self.send_frame(WS_CLOSE, struct.pack('!H', 1000))
+
+    def on_audio(self, data):
+        for result in self.session.receive(len(data)):
+            self.send_result(result)
+
+class RecognizeSession:
+    """
+    Audio received in one recognize connection and the scripted results still to be sent
+    """
+    def __init__(self, script, rate):
+        self.script = sorted(script, key=lambda result: result['at'])
+        self.rate = rate
+        self.bytes_received = 0
+        self.chunks_received = 0
+        self.result_index = 0
+        self.timestamps = False
+        self.sent = []
+
+    @property
+    def audio_time(self):
+        # 16-bit mono linear PCM
+        return self.bytes_received / (2 * self.rate)
+
+    def receive(self, size):
+        self.bytes_received += size
+        self.chunks_received += 1
+        return self.pending(self.audio_time)
+
+    def pending(self, audio_time):
+        ready = []
+        while self.script and (audio_time is None or self.script[0]['at'] <= audio_time):
+            result = dict(self.script.pop(0))
+            result.setdefault('final', False)
+            result['result_index'] = self.result_index
+            if result['final']:
+                self.result_index += 1
+            ready.append(result)
+        self.sent.extend(ready)
+        return ready
+
+class FakeSpeechToText(StubServer):
+    """
+    Stand-in for the Speech to Text websocket service that answers with scripted results
+
+    Each entry of the script is a dict with the audio offset in seconds at which it is sent
+    ("at"), the "transcript" and whether it is "final". A result is sent once that much audio has
+    been received, results left over when the client stops are sent before it is closed.
+
+    Parameters:
+        script (list[dict], optional): results for the next connection. defaults to none
+        host (str, optional): address to bind to. defaults to localhost
+        port (int, optional): port to bind to. defaults to an ephemeral port
+        delay (float, optional): seconds of recognition delay added to each result. defaults to 0
+    """
+    def __init__(self, script=None, host='127.0.0.1', port=0, delay=0, rate=44100):
+        super().__init__(ThreadingTCPServer((host, port), SpeechToTextHandler))
+        self.script = script or []
+        self.delay = delay
+        self.rate = rate
+        self.sessions = []
+
+    def open_session(self):
+        with self.lock:
+            session = RecognizeSession(self.script, self.rate)
+            self.sessions.append(session)
+        return session
+
+    @property
+    def url(self):
+        # the SDK only rewrites https to wss, so hand it a websocket url directly
+        return f'ws://{self.host}:{self.port}'
@@ -0,0 +1,164 @@
+"""
+Replay recorded video through the Webcam loop to measure the cost of idling
+
+Each recording is played back like a live camera, once with the Webcam loop running at full
+rate and once with idle duty cycling, and the CPU time of both runs is compared. Long
+recordings of an empty seat or a player looking away show the savings; recordings with a
+player returning show how many eye samples were lost while waking up.
+
+    python VideoReplay.py idle_session.mp4 --speed 4
+"""
+import argparse
+import json
+import sys
+import time
+
+from threading import Event, Thread
+
+import cv2
+
+import Metrics
+from Webcam import Webcam
+
+class ReplayCapture:
+    """
+    Video file played back like a live camera
+
+    Frames come due at the recording's frame rate times speed. grab waits for the next frame
+    when called early and skips the frames that went by when called late, as a camera would.
+
+    Parameters:
+        path (str): video file
+        speed (float, optional): playback speed. defaults to 1
+    """
+    def __init__(self, path, speed=1):
+        self.cap = cv2.VideoCapture(path)
+        self.fps = (self.cap.get(cv2.CAP_PROP_FPS) or 30) * speed
+        self.position = 0
+        self.skipped = 0
+        self.started = None
+        self.finished = False
+
+    def isOpened(self):
+        return self.cap.isOpened() and not self.finished
+
+    def grab(self):
+        now = time.perf_counter()
+        if self.started is None:
+            self.started = now
+
+        due = int((now - self.started) * self.fps)
+        if due < self.position:
+            time.sleep(self.started + self.position / self.fps - now)
+            due = self.position
+
+        while self.position < due:
+            if not self.cap.grab():
+                self.finished = True
+                return False
+            self.position += 1
+            self.skipped += 1
+
+        success = self.cap.grab()
+        self.position += 1
+        if not success:
+            self.finished = True
+        return success
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def release(self):
+        self.cap.release()
+
+def metric_values(names):
+    return {name: Metrics.REGISTRY[name].value for name in names}
+
+def replay(path, speed, idle_after, idle_interval, wake_latency):
+    """
+    Run the Webcam loop over a recording and measure it
+
+    Returns:
+        report (dict): wall and CPU seconds, frames, presence checks, eye samples and idle share
+    """
+    names = ['webcam_frames_total', 'webcam_no_face_frames_total', 'webcam_presence_checks_total']
+    before = metric_values(names)
+    samples = []
+
+    # timings are scaled with the playback speed so idling behaves as it would live
+    webcam = Webcam(
+        on_eye_pos=samples.append,
+        capture=ReplayCapture(path, speed),
+        idle_after=idle_after / speed if idle_after is not None else None,
+        idle_interval=idle_interval / speed,
+        wake_latency=wake_latency / speed,
+    )
+
+    idle_polls = []
+    done = Event()
+    def poll_idle():
+        while not done.is_set():
+            idle_polls.append(webcam.idle)
+            done.wait(0.05)
+
+    poller = Thread(target=poll_idle, daemon=True)
+    poller.start()
+
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    webcam.run()
+    cpu = time.process_time() - cpu
+    wall = time.perf_counter() - wall
+    done.set()
+    poller.join()
+
+    after = metric_values(names)
+    return {
+        'wall_seconds': wall,
+        'cpu_seconds': cpu,
+        'cpu_share': cpu / wall if wall else 0,
+        'frames': after['webcam_frames_total'] - before['webcam_frames_total'],
+        'no_face_frames': after['webcam_no_face_frames_total'] - before['webcam_no_face_frames_total'],
+        'presence_checks': after['webcam_presence_checks_total'] - before['webcam_presence_checks_total'],
+        'eye_samples': len(samples),
+        'idle_share': sum(idle_polls) / len(idle_polls) if idle_polls else 0,
+    }
+
+def print_run(name, run):
+    print(f"  {name}: {run['cpu_seconds']:.2f}s CPU over {run['wall_seconds']:.2f}s ({100 * run['cpu_share']:.0f}%), "
+          f"{run['frames']} frames, {run['presence_checks']} presence checks, {run['eye_samples']} eye samples, "
+          f"idle {100 * run['idle_share']:.0f}% of the time")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare Webcam CPU use with and without idle duty cycling')
+    parser.add_argument('videos', nargs='+', help='recorded webcam sessions')
+    parser.add_argument('--speed', type=float, default=1, help='playback speed')
+    parser.add_argument('--idle-after', type=float, default=2, help='seconds without a face before idling')
+    parser.add_argument('--idle-interval', type=float, default=0.1, help='first delay between presence checks')
+    parser.add_argument('--wake-latency', type=float, default=0.5, help='longest delay between presence checks')
+    parser.add_argument('--json', action='store_true', help='print the report as json')
+    args = parser.parse_args(argv)
+
+    reports = []
+    for path in args.videos:
+        full = replay(path, args.speed, None, args.idle_interval, args.wake_latency)
+        duty = replay(path, args.speed, args.idle_after, args.idle_interval, args.wake_latency)
+        saved = 1 - duty['cpu_seconds'] / full['cpu_seconds'] if full['cpu_seconds'] else 0
+        reports.append({'file': path, 'full_rate': full, 'duty_cycled': duty, 'cpu_saved': saved})
+
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        for report in reports:
+            print(f"{report['file']}: {100 * report['cpu_saved']:.0f}% CPU saved")
+            print_run('full rate', report['full_rate'])
+            print_run('duty cycled', report['duty_cycled'])
+
+if __name__ == '__main__':
+    main()
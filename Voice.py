@@ -0,0 +1,133 @@
+import time
+
+from collections import deque
+from queue import Queue, Full
+
+import pyaudio
+from ibm_watson.websocket import RecognizeCallback, AudioSource
+
+import Metrics
+
+# PyAudio Configuration
+CHUNK = 1024
+BUF_MAX_SIZE = CHUNK * 10
+q = Queue(maxsize=int(round(BUF_MAX_SIZE / CHUNK)))
+FORMAT = pyaudio.paInt16
+CHANNELS = 1
+RATE = 44100
+
+# Create an instance of AudioSource
+audio_source = AudioSource(q, True, True)
+
+AUDIO_CHUNKS = Metrics.counter('audio_chunks_total', 'Audio chunks captured')
+AUDIO_DROPS = Metrics.counter('audio_drops_total', 'Audio chunks discarded because the queue was full')
+AUDIO_QUEUE_DEPTH = Metrics.gauge('audio_queue_depth', 'Audio chunks waiting to be sent to the recognizer')
+RECOGNIZER_LATENCY = Metrics.histogram('recognizer_result_seconds', 'Time from capturing the last word of an utterance to its final result')
+RECOGNIZER_ERRORS = Metrics.counter('recognizer_errors_total', 'Errors received from the recognizer')
+
+class AudioClock:
+    """
+    Capture times of the audio streamed to the recognizer, by offset into the stream
+
+    The recognizer timestamps words by their offset into the audio it received, which only
+    counts the chunks that made it into the queue.
+
+    Parameters:
+        rate (int, optional): sample rate of the stream. defaults to RATE
+        size (int, optional): number of chunks remembered. defaults to 2048, about 47 seconds
+    """
+    def __init__(self, rate=RATE, size=2048):
+        self.rate = rate
+        self.offset = 0
+        self.captured = deque(maxlen=size)
+
+    def reset(self, rate=RATE):
+        """
+        Start a new stream, before its first chunk is queued
+        """
+        self.rate = rate
+        self.offset = 0
+        self.captured.clear()
+
+    def add(self, frames, at):
+        self.offset += frames / self.rate
+        self.captured.append((self.offset, at))
+
+    def captured_at(self, offset):
+        """
+        Return when the audio at offset seconds into the stream was captured, or None if unknown
+        """
+        found = None
+        # copied in one step, as the audio thread keeps appending
+        for end, at in reversed(tuple(self.captured)):
+            if end < offset:
+                break
+            found = at
+        return found
+
+audio_clock = AudioClock()
+
+# Define callback for the Speech to Text service
+class MyRecognizeCallback(RecognizeCallback):
+    def __init__(self, on_command, on_closed=None):
+        RecognizeCallback.__init__(self)
+        self.on_command = on_command
+        self.on_closed = on_closed
+
+    def on_transcription(self, transcript):
+        print(transcript)
+
+    def on_connected(self):
+        print('Connection was successful')
+
+    def on_error(self, error):
+        RECOGNIZER_ERRORS.inc()
+        print(f'Error received: {error}')
+
+    def on_inactivity_timeout(self, error):
+        print(f'Inactivity timeout: {error}')
+
+    def on_listening(self):
+        print('Service is listening\nEnter CTRL+C to end recording...')
+
+    def on_hypothesis(self, hypothesis):
+        pass
+
+    def on_data(self, data):
+        # Once received a command, pass the command string on to be sent to the server
+        if(data['results'][0]['final']):
+            alternative = data['results'][0]['alternatives'][0]
+            timestamps = alternative.get('timestamps')
+            if timestamps:
+                # each word is [word, start, end] in seconds into the audio stream
+                captured = audio_clock.captured_at(timestamps[-1][2])
+                if captured is not None:
+                    RECOGNIZER_LATENCY.observe(time.perf_counter() - captured)
+            transcript = alternative['transcript'].lower()
+            self.on_command(transcript)
+
+    def on_close(self):
+        if self.on_closed:
+            self.on_closed()
+        print('Connection closed')
+
+# Initiate the recognize service and pass in the AudioSource
+def recognize_using_websocket(speech_to_text, callback, customization_id=None, source=audio_source, rate=RATE):
+    speech_to_text.recognize_using_websocket(audio=source,
+                                             content_type=f'audio/l16; rate={rate}',
+                                             recognize_callback=callback,
+                                             language_customization_id=customization_id,
+                                             customization_weight=0.9,
+                                             interim_results=True,
+                                             timestamps=True)
+
+# Define callback for PyAudio to store the recording in queue
+def pyaudio_callback(in_data, frame_count, time_info, status):
+    AUDIO_CHUNKS.inc()
+    try:
+        q.put_nowait(in_data)
+        audio_clock.add(frame_count, time.perf_counter())
+    except Full:
+        AUDIO_DROPS.inc() # discard
+    AUDIO_QUEUE_DEPTH.set(q.qsize())
+    return (None, pyaudio.paContinue)
@@ -1,8 +1,22 @@
+import time
+
 import cv2
 import mediapipe as mp
 import numpy as np
 
+import Metrics
+
 KERNEL = np.ones((9, 9), np.uint8)
+# most frames a camera backend may have buffered, and how long a grab takes at least when it
+# has to wait for a new frame
+STALE_FRAMES = 5
+FRESH_FRAME_WAIT = 0.005
+
+WEBCAM_FRAMES = Metrics.counter('webcam_frames_total', 'Webcam frames processed')
+WEBCAM_NO_FACE = Metrics.counter('webcam_no_face_frames_total', 'Webcam frames without a detected face')
+WEBCAM_FRAME_TIME = Metrics.histogram('webcam_frame_seconds', 'Processing time of a webcam frame')
+WEBCAM_PRESENCE_CHECKS = Metrics.counter('webcam_presence_checks_total', 'Low resolution face checks while idle')
+WEBCAM_IDLE = Metrics.gauge('webcam_idle', 'Whether the webcam loop is idling without a face')
 
 def landmarks_to_np(landmarks, shape, dtype="int"):
     """
@@ -184,31 +198,119 @@ def print_eye_pos(eye_pos):
 
 
 class Webcam:
-    def __init__(self, debug=False):
-        self._cap = cv2.VideoCapture(0) # initialize video capture
+    """
+    Tracks the eye positions of the face in front of the webcam
+
+    Without a face for idle_after seconds, FaceMesh is paused and only a low resolution face
+    detection runs on an occasional frame. The checks start idle_interval apart and back off
+    to wake_latency apart, counting the time spent reading and checking a frame, so a returning
+    face goes unnoticed for about wake_latency plus one frame and one check at most; the first
+    frame with a face resumes full rate tracking.
+
+    Parameters:
+        debug (boolean, optional): print eye positions. defaults to false
+        on_eye_pos (callable, optional): called with every new eye position. defaults to none
+        capture (cv2.VideoCapture, optional): frame source. defaults to the first camera
+        idle_after (float, optional): seconds without a face before idling, none to never
+            idle. defaults to 2
+        idle_interval (float, optional): first delay between presence checks. defaults to 0.1
+        wake_latency (float, optional): longest delay between presence checks. defaults to 0.5
+        idle_scale (float, optional): scale of the frames used for presence checks. defaults to 0.25
+    """
+    def __init__(self, debug=False, on_eye_pos=None, capture=None, idle_after=2, idle_interval=0.1,
+                 wake_latency=0.5, idle_scale=0.25):
+        if capture is None:
+            capture = cv2.VideoCapture(0) # initialize video capture
+            # keep as few frames queued as the backend allows, they go stale while idling
+            capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self._cap = capture
         self._face_mesh = mp.solutions.face_mesh
+        self._face_detection = mp.solutions.face_detection
         self._left = [7, 33, 133, 144, 145, 153, 154, 155, 157, 158, 159, 160, 161, 163, 173, 246]
         self._right = [249, 263, 362, 373, 374, 380, 381, 382, 384, 385, 386, 387, 388, 390, 398, 466]
 
         self.running = False
         self.debug   = debug
         self.eye_pos = (0, 0)
+        self.on_eye_pos = on_eye_pos
+
+        self.idle_after = idle_after
+        self.idle_interval = idle_interval
+        self.wake_latency = wake_latency
+        self.idle_scale = idle_scale
+        self.idle = False
+
+    def set_idle(self, idle):
+        self.idle = idle
+        WEBCAM_IDLE.set(int(idle))
+
+    def face_present(self, face_detection, img):
+        """
+        Cheap check for a face on a downscaled frame, used while idle
+        """
+        small = cv2.resize(img, None, fx=self.idle_scale, fy=self.idle_scale, interpolation=cv2.INTER_AREA)
+        return bool(face_detection.process(small).detections)
+
+    def read_fresh(self):
+        """
+        Read a frame captured after the call, skipping frames the camera buffered meanwhile
+        """
+        for _ in range(STALE_FRAMES):
+            began = time.perf_counter()
+            if not self._cap.grab():
+                return False, None
+            # buffered frames are handed out at once, a new one has to be waited for
+            if time.perf_counter() - began > FRESH_FRAME_WAIT:
+                break
+        return self._cap.retrieve()
 
     def run(self):
         self.running = True
         with self._face_mesh.FaceMesh(
             min_detection_confidence=0.5,
-            min_tracking_confidence=0.5) as face_mesh:
+            min_tracking_confidence=0.5) as face_mesh, \
+             self._face_detection.FaceDetection(min_detection_confidence=0.5) as face_detection:
 
+            last_face = time.perf_counter()
+            last_check = last_face
+            interval = self.idle_interval
             while self.running and self._cap.isOpened():
-                success, img = self._cap.read()
+                if self.idle:
+                    # checks start interval apart, reading and checking a frame count towards it
+                    delay = last_check + interval - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                    last_check = time.perf_counter()
+                    success, img = self.read_fresh()
+                else:
+                    success, img = self._cap.read()
                 if not success:
                     continue
 
+                started = time.perf_counter()
+                WEBCAM_FRAMES.inc()
                 img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+
+                if self.idle:
+                    WEBCAM_PRESENCE_CHECKS.inc()
+                    if not self.face_present(face_detection, img):
+                        # back off towards the wake latency bound while nobody is there
+                        interval = min(interval * 2, self.wake_latency)
+                        WEBCAM_FRAME_TIME.observe(time.perf_counter() - started)
+                        continue
+                    self.set_idle(False)
+                    last_face = started
+
                 results = face_mesh.process(img)
                 if not results.multi_face_landmarks:
+                    WEBCAM_NO_FACE.inc()
+                    if self.idle_after is not None and started - last_face > self.idle_after:
+                        self.set_idle(True)
+                        interval = min(self.idle_interval, self.wake_latency)
+                        last_check = started
+                    WEBCAM_FRAME_TIME.observe(time.perf_counter() - started)
                     continue
+                last_face = started
 
                 # get masked grayscale image and bounding boxes for each eye
                 landmarks = landmarks_to_np(results.multi_face_landmarks[0].landmark, img.shape)
@@ -224,11 +326,15 @@ class Webcam:
                 right_pos = contouring(thresh[:, mid:], mid, img, right_min_max, True)
 
                 self.eye_pos = (left_pos, right_pos)
+                WEBCAM_FRAME_TIME.observe(time.perf_counter() - started)
+                if self.on_eye_pos:
+                    self.on_eye_pos(self.eye_pos)
 
                 if self.debug:
                     print_eye_pos(self.eye_pos)
 
             self._cap.release()
+            self.set_idle(False)
 
     def get_eye_pos(self):
         return self.eye_pos
@@ -237,8 +343,6 @@ class Webcam:
         self.running = False
 
 
-import time
-
 class Timer:
 
     def __init__(self):
@@ -271,8 +375,11 @@ DWELL_MOVE = 2
 WKEY_UP = False
 
 class GazerBeam:
-    def __init__(self, args, stdout=sys.stdout):
+    def __init__(self, args, ring, stdout=sys.stdout):
         self.args = args
+        self.ring = ring
+        # samples from before this command are stale, e.g. from an earlier webcam session
+        self.start_seq = ring.seq
         self.stdout = stdout
         keyboard.add_hotkey('.', self.terminate)
 
@@ -319,20 +426,21 @@ class GazerBeam:
             pyautogui.move(pos[0] * MOVE_SPEED, 0)
 
 
-    def run(self):
-        from threading import Thread
+    def get_eye_pos(self):
+        # latest sample of the shared webcam gaze source
+        sample = self.ring.latest()
+        if sample is None or self.ring.seq == self.start_seq:
+            return (0, 0)
+        _, left, right = sample
+        return (int(left), int(right))
 
+    def run(self):
         config = self.handle_args()
 
         # initialize collection timer
         ct = Timer()
         ct.run()
 
-        # initialize webcam and run thread
-        wc = Webcam()
-        th = Thread(target=wc.run, name='webcam')
-        th.start()
-
         self.running = True
         prev_pos = (0, 0)
 
@@ -346,7 +454,7 @@ class GazerBeam:
 
         while self.running:
             if ct.elapsed() > 1/60:
-                pos = wc.get_eye_pos()
+                pos = self.get_eye_pos()
                 self.handle_eye_pos(pos, prev_pos, dt, config)
                 prev_pos = pos
                 ct.run()
@@ -354,10 +462,5 @@ class GazerBeam:
         # reset stdout
         sys.stdout = stdout
 
-        wc.terminate()
-
-        # wait for webcam to shut down
-        th.join()
-
     def terminate(self):
         self.running = False
@@ -0,0 +1,63 @@
+import json
+import random
+import wave
+
+import pytest
+
+pytest.importorskip('pyaudio')
+
+from AudioReplay import Replay
+from StubServers import FakeSpeechToText
+
+RATE = 16000
+
+def write_recording(path, seconds, script):
+    # quiet noise, the fake server only counts the audio
+    noise = random.Random(0)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(b''.join(noise.randrange(-64, 64).to_bytes(2, 'little', signed=True)
+                                 for _ in range(int(seconds * RATE))))
+    with open(path.with_suffix('.json'), 'w') as f:
+        json.dump(script, f)
+    return str(path)
+
+SCRIPT = [
+    {'at': 0.3, 'transcript': 'turn', 'final': False},
+    {'at': 0.5, 'transcript': 'Turn left', 'final': True},
+    {'at': 0.55, 'transcript': 'undo', 'final': True},
+    {'at': 1.0, 'transcript': 'move forward', 'final': True},
+]
+
+def test_replay_dispatches_scripted_results(tmp_path):
+    path = write_recording(tmp_path / 'commands.wav', 1, SCRIPT)
+    with FakeSpeechToText() as fake:
+        report = Replay(fake, speed=2, timeout=10).run(path)
+
+    assert report['dispatched'] == ['turn left', 'undo', 'move forward']
+    assert report['chunks_received'] == report['chunks']
+    assert report['passed']
+
+def test_replay_keeps_delayed_results_in_order(tmp_path):
+    # results completed by the same chunk are delayed together and must still arrive in order
+    words = ['one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight']
+    script = [{'at': 0.5 + i / 1000, 'transcript': word, 'final': True} for i, word in enumerate(words)]
+    script.append({'at': 1.0, 'transcript': 'move forward', 'final': True})
+    path = write_recording(tmp_path / 'commands.wav', 1, script)
+    with FakeSpeechToText(delay=0.2) as fake:
+        report = Replay(fake, speed=1, timeout=10).run(path)
+
+    assert report['dispatched'] == words + ['move forward']
+    assert report['result_latency_ms']['max'] < 100
+    assert report['passed']
+
+def test_replay_fails_when_audio_is_dropped(tmp_path):
+    path = write_recording(tmp_path / 'commands.wav', 3, SCRIPT)
+    with FakeSpeechToText() as fake:
+        report = Replay(fake, speed=50, timeout=10).run(path)
+
+    assert report['chunks_dropped'] > 0
+    assert report['chunks_received'] < report['chunks']
+    assert not report['passed']
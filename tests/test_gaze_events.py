@@ -0,0 +1,70 @@
+import io
+
+import pytest
+
+from GazeEvents import (Fixation, GazeRecorder, IDTDetector, IVTDetector, Saccade, TobiiParser,
+                        parse_tobii_sample)
+from GazeSource import SyntheticSource
+
+def detect(detector, samples):
+    events = []
+    for t, x, y in samples:
+        events.extend(detector.add(t, x, y))
+    events.extend(detector.flush())
+    return events
+
+@pytest.mark.parametrize('detector', [IVTDetector, IDTDetector])
+@pytest.mark.parametrize('seed', [1, 2])
+def test_detects_synthetic_fixations(detector, seed):
+    source = SyntheticSource(realtime=False, duration=20, seed=seed)
+    events = detect(detector(), source.samples())
+
+    fixations = [event for event in events if isinstance(event, Fixation)]
+    saccades = [event for event in events if isinstance(event, Saccade)]
+    assert len(fixations) == len(source.fixations)
+    assert len(saccades) in (len(fixations) - 1, len(fixations))
+
+    # boundaries may shift by the samples that are part fixation, part saccade
+    for fixation, (start, end, x, y) in zip(fixations, source.fixations):
+        assert fixation.start == pytest.approx(start, abs=2 / source.rate)
+        assert fixation.duration == pytest.approx(end - start, abs=2 / source.rate)
+        assert fixation.x == pytest.approx(x, abs=5)
+        assert fixation.y == pytest.approx(y, abs=5)
+
+def test_idt_trailing_saccade_duration():
+    samples = [(i / 60, 100, 100) for i in range(12)]
+    samples += [(0.25, 400, 100), (0.3, 700, 100), (0.35, 1000, 100)]
+    events = detect(IDTDetector(), samples)
+
+    assert isinstance(events[0], Fixation)
+    assert events[1] == Saccade(0.25, pytest.approx(0.1), 400, 100, 1000, 100, 3)
+
+def test_ivt_saccade_duration():
+    samples = [(i / 60, 100, 100) for i in range(12)]
+    samples += [(0.2, 400, 100), (0.25, 700, 100)]
+    samples += [(0.25 + i / 60, 700, 100) for i in range(1, 12)]
+    events = detect(IVTDetector(), samples)
+
+    assert [type(event) for event in events] == [Fixation, Saccade, Fixation]
+    assert events[1].start == 0.2
+    assert events[1].duration == pytest.approx(0.05)
+
+def test_parse_tobii_sample():
+    assert parse_tobii_sample('03:14:07.250,812.5,433.1,dwelling...\n') == (11647.25, 812.5, 433.1)
+    assert parse_tobii_sample('12:00:01.000,1,2,') == (1, 1, 2)
+    assert parse_tobii_sample('Press any key to exit') is None
+
+def test_tobii_parser_counts_past_clock_wrap():
+    parse = TobiiParser()
+    assert parse('11:59:59.500,1,2,')[0] == 43199.5
+    assert parse('12:00:00.250,1,2,')[0] == 43200.25
+
+def test_recorder_passes_lines_through_without_detector():
+    out = io.StringIO()
+    recorder = GazeRecorder(out, parse=TobiiParser())
+    recorder.write('03:14:07.250,812.5,433.1,dwelling...\n03:14:07.2')
+    recorder.write('67,813,434,\n')
+    recorder.close()
+
+    assert out.getvalue() == '03:14:07.250,812.5,433.1,dwelling...\n03:14:07.267,813,434,\n'
+    assert recorder.written == len(out.getvalue())
@@ -0,0 +1,105 @@
+import sys
+import time
+
+import pytest
+
+from EyeTracker import EyeTracker
+from GazeSource import GazeRing, SyntheticSource, WebcamSource, iter_samples
+
+def test_ring_reader_returns_pushed_samples():
+    ring = GazeRing(8)
+    reader = ring.reader()
+    for i in range(5):
+        ring.push(i, 10 * i, 20 * i)
+
+    assert list(iter_samples(reader.read())) == [(i, 10 * i, 20 * i) for i in range(5)]
+    assert reader.read() == []
+    assert ring.latest() == (4, 40, 80)
+
+def test_ring_reader_skips_overwritten_samples():
+    ring = GazeRing(8)
+    reader = ring.reader()
+    for i in range(20):
+        ring.push(i, i, i)
+
+    samples = list(iter_samples(reader.read()))
+    assert [t for t, _, _ in samples] == list(range(12, 20))
+    assert reader.dropped == 12
+
+def test_synthetic_samples_are_reproducible():
+    first = list(SyntheticSource(realtime=False, duration=2, seed=1).samples())
+    second = list(SyntheticSource(realtime=False, duration=2, seed=1).samples())
+    assert first == second
+
+    times = [t for t, _, _ in first]
+    assert times == [i / 60 for i in range(len(times))]
+    assert 2 <= times[-1] < 3
+
+def test_synthetic_source_fills_ring():
+    source = SyntheticSource(realtime=False, duration=1, seed=1)
+    reader = source.ring.reader()
+    source.start()
+    source._thread.join()
+    source.stop()
+
+    samples = list(iter_samples(reader.read()))
+    assert samples == list(SyntheticSource(realtime=False, duration=1, seed=1).samples())
+
+def test_eye_tracker_records_synthetic_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = EyeTracker(source='synthetic')
+    tracker.start_eye_tracking()
+    time.sleep(0.3)
+    tracker.terminate_eye_tracking()
+
+    with open(tmp_path / tracker.csv) as f:
+        lines = f.readlines()
+    assert len(lines) >= 10
+    assert len(lines[0].split(',')) == 3
+
+def test_track_command_needs_eye_directions(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # importing Webcam for GazerBeam would raise ImportError
+    monkeypatch.setitem(sys.modules, 'Webcam', None)
+    tracker = EyeTracker(source='synthetic')
+    tracker.start_eye_tracking()
+    tracker.process_transcript('track move')
+    tracker.terminate_eye_tracking()
+
+def test_webcam_waits_for_track_command(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    starts = []
+    monkeypatch.setattr(WebcamSource, 'start', lambda source: starts.append(source))
+    tracker = EyeTracker(source='webcam')
+    tracker.start_eye_tracking()
+    assert not starts
+    assert not tracker.source.running
+    tracker.terminate_eye_tracking()
+
+def test_eye_tracker_summarizes_with_configured_thresholds(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    tracker = EyeTracker('idt', keep_raw=False, source='synthetic', event_options={'dispersion': 40})
+    tracker.start_eye_tracking()
+    assert tracker.recorder.detector.dispersion == 40
+    time.sleep(0.3)
+    tracker.terminate_eye_tracking()
+
+    with open(tmp_path / tracker.csv) as f:
+        records = f.readlines()
+    assert records and all(record[0] in 'FS' for record in records)
+
+def test_webcam_does_not_summarize():
+    assert EyeTracker('idt', source='webcam').events is None
+
+def test_eye_tracker_rejects_unknown_source():
+    with pytest.raises(ValueError):
+        EyeTracker(source='Synthetic')
+
+def test_eye_tracker_rejects_unavailable_tobii(monkeypatch):
+    monkeypatch.setattr('EyeTracker.USE_TOBII', False)
+    with pytest.raises(ValueError):
+        EyeTracker(source='tobii')
+
+def test_eye_tracker_rejects_unknown_events():
+    with pytest.raises(ValueError):
+        EyeTracker('fixations', source='synthetic')
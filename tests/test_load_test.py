@@ -0,0 +1,41 @@
+import os
+import socket
+import time
+
+import pytest
+
+import LoadTest
+from LoadTest import parse_args, run, write_gaze_csv
+
+def test_load_test_against_stubs(tmp_path, monkeypatch):
+    receivers = []
+    class Receiver(LoadTest.StubGazeReceiver):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            receivers.append(self)
+    monkeypatch.setattr(LoadTest, 'StubGazeReceiver', Receiver)
+
+    timeout = socket.getdefaulttimeout()
+    try:
+        commands, gaze = run(parse_args([
+            '--players', '2', '--duration', '0.5', '--command-rate', '4', '--gaze-rate', '4',
+            '--gaze-bytes', '4096', '--stub-error-rate', '1',
+        ]))
+    finally:
+        socket.setdefaulttimeout(timeout)
+
+    assert commands['requests'] == 4
+    assert commands['error_rate'] == 1
+    assert commands['error_types'] == {'HTTPError': 4}
+    assert commands['throughput'] == pytest.approx(8, rel=0.25)
+    assert gaze['requests'] == 4
+    assert gaze['errors'] == 0
+
+    # the receiver counts an upload once its connection is closed, which may trail the run
+    receiver, = receivers
+    deadline = time.perf_counter() + 1
+    while receiver.uploads < 4 and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    write_gaze_csv(tmp_path / 'gaze.csv', 4096)
+    assert receiver.uploads == 4
+    assert receiver.bytes_received == 4 * os.path.getsize(tmp_path / 'gaze.csv')
@@ -0,0 +1,32 @@
+import pytest
+
+pytest.importorskip('pyaudio')
+
+import Voice
+
+def test_audio_clock_finds_capture_time_of_offset():
+    clock = Voice.AudioClock(rate=1000)
+    for i in range(10):
+        clock.add(100, 50 + i)
+
+    assert clock.captured_at(0.05) == 50
+    assert clock.captured_at(0.25) == 52
+    assert clock.captured_at(0.3) == 52
+    assert clock.captured_at(2) is None
+
+def test_final_result_latency_counts_from_last_word(monkeypatch):
+    clock = Voice.AudioClock(rate=1000)
+    clock.add(1000, 10)
+    clock.add(1000, 11)
+    monkeypatch.setattr(Voice, 'audio_clock', clock)
+    monkeypatch.setattr(Voice.time, 'perf_counter', lambda: 11.4)
+    count, total = Voice.RECOGNIZER_LATENCY.count, Voice.RECOGNIZER_LATENCY.sum
+
+    commands = []
+    callback = Voice.MyRecognizeCallback(commands.append)
+    callback.on_data({'results': [{'final': True, 'alternatives': [
+        {'transcript': 'Turn left', 'timestamps': [['turn', 1.2, 1.5], ['left', 1.5, 1.9]]}]}]})
+
+    assert commands == ['turn left']
+    assert Voice.RECOGNIZER_LATENCY.count == count + 1
+    assert Voice.RECOGNIZER_LATENCY.sum - total == pytest.approx(0.4)
@@ -0,0 +1,100 @@
+import time
+
+from threading import Thread
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('mediapipe')
+pytest.importorskip('pyautogui')
+pytest.importorskip('keyboard')
+
+from Webcam import Webcam
+
+FRAME_INTERVAL = 1 / 30
+
+class FakeCapture:
+    """
+    Camera delivering a blank frame every FRAME_INTERVAL, grab waits for the next one
+    """
+    def __init__(self):
+        self.frame = np.zeros((48, 64, 3), np.uint8)
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        now = time.perf_counter()
+        time.sleep(FRAME_INTERVAL - now % FRAME_INTERVAL)
+        return True
+
+    def retrieve(self):
+        return True, self.frame
+
+    def read(self):
+        self.grab()
+        return self.retrieve()
+
+    def release(self):
+        pass
+
+class FakeSolution:
+    """
+    Stands in for a MediaPipe solution module and the model it creates
+    """
+    def __init__(self, process):
+        self.process = process
+
+    def FaceMesh(self, **kwargs):
+        return self
+
+    FaceDetection = FaceMesh
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+def test_idles_backs_off_and_wakes():
+    idle_after, idle_interval, wake_latency = 0.2, 0.025, 0.1
+    started = time.perf_counter()
+    face_at = started + 1.2
+    meshes, checks = [], []
+
+    def mesh(img):
+        meshes.append(time.perf_counter())
+        return SimpleNamespace(multi_face_landmarks=None)
+
+    def detect(img):
+        checks.append(time.perf_counter())
+        return SimpleNamespace(detections=[object()] if checks[-1] >= face_at else [])
+
+    webcam = Webcam(capture=FakeCapture(), idle_after=idle_after, idle_interval=idle_interval,
+                    wake_latency=wake_latency)
+    webcam._face_mesh = FakeSolution(mesh)
+    webcam._face_detection = FakeSolution(detect)
+    th = Thread(target=webcam.run, daemon=True)
+    th.start()
+    time.sleep(1.6)
+    webcam.terminate()
+    th.join()
+
+    # full rate until nobody was seen for idle_after
+    assert checks[0] - started >= idle_after
+    assert len([t for t in meshes if t < checks[0]]) >= 5
+
+    # presence checks back off to wake_latency apart, the time to grab a frame included
+    before_face = [t for t in checks if t < face_at]
+    gaps = [b - a for a, b in zip(before_face, before_face[1:])]
+    assert gaps[0] < wake_latency
+    capped = [gap for gap in gaps if gap > 0.75 * wake_latency]
+    assert len(capped) >= 5
+    assert sum(capped) / len(capped) == pytest.approx(wake_latency, abs=0.015)
+    assert max(gaps) <= wake_latency + FRAME_INTERVAL
+
+    # the first check after the face returns wakes the loop back to full rate
+    woke = next(t for t in checks if t >= face_at)
+    assert woke - face_at <= wake_latency + FRAME_INTERVAL
+    assert len([t for t in meshes if woke <= t < woke + idle_after]) >= 4